@@ -0,0 +1,44 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import sys
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Add src to path
+sys.path.insert(0, str(ROOT / 'src'))
+
+
+def percentile(data: List[float], pct: float) -> float:
+    """Nearest-rank percentile (same rule as PerformanceMonitor)"""
+    ordered = sorted(data)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+def latency_summary(samples_ms: List[float]) -> dict:
+    if not samples_ms:
+        return {}
+    return {
+        'count': len(samples_ms),
+        'p50_ms': round(percentile(samples_ms, 0.50), 3),
+        'p95_ms': round(percentile(samples_ms, 0.95), 3),
+        'p99_ms': round(percentile(samples_ms, 0.99), 3),
+        'max_ms': round(max(samples_ms), 3),
+        'pages_per_second': round(len(samples_ms) / (sum(samples_ms) / 1000), 2) if sum(samples_ms) else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        import psutil
+        memory = psutil.Process().memory_info()
+        return round(getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024), 1)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark the security pipeline layer by layer on a synthetic corpus
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 10KB,100KB,1MB] [--depths 8,64]
+                                        [--pages-per-config N] [--llm-latency-ms MS]
+                                        [--output report.json]
+
+Runs DOMAnalyzer, NLPThreatClassifier, MultiFactorRiskCalculator and the full
+SecurityMediator (with a stubbed LLM, caches disabled) and reports p50/p95/p99
+latency, pages per second and peak RSS as JSON. Exits non-zero when the
+end-to-end p95 misses max_latency_ms from config.yaml.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+
+import yaml
+
+from bench_utils import ROOT, latency_summary, peak_rss_mb
+from corpus import generate_corpus, parse_size
+
+from analyzers.dom_analyzer import DOMAnalyzer
+from analyzers.nlp_classifier import NLPThreatClassifier
+from analyzers.parsed_document import ParsedDocument
+from analyzers.text_normalizer import TextNormalizer
+from core.security_mediator import SecurityMediator
+from policies.risk_calculator import MultiFactorRiskCalculator
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubLLMClient:
+    """Stands in for genai.GenerativeModel with a fixed reply and latency"""
+
+    REPLY = json.dumps({
+        'is_malicious': False,
+        'confidence': 0.5,
+        'threat_type': 'none',
+        'reasoning': 'benchmark stub',
+        'recommended_action': 'allow'
+    })
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [StubResponse(self.REPLY)] if stream else StubResponse(self.REPLY)
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._stream_async() if stream else StubResponse(self.REPLY)
+
+    async def _stream_async(self):
+        yield StubResponse(self.REPLY)
+
+
+def load_config() -> dict:
+    config_path = ROOT / 'config.yaml'
+    config = yaml.safe_load(config_path.read_text()) if config_path.exists() else {}
+
+    # Every page must go through every layer
+    config['verdict_cache'] = {'enabled': False}
+    config['llm_cache'] = {'enabled': False}
+    return config
+
+
+def timed(samples, layer, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    samples[layer].append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def run(args) -> dict:
+    config = load_config()
+    llm_client = StubLLMClient(args.llm_latency_ms)
+    mediator = SecurityMediator(config, llm_client=llm_client)
+
+    dom_analyzer = DOMAnalyzer(parser=config.get('dom_parser', 'lxml'),
+                               max_depth=config.get('dom_max_depth', 256))
+    nlp_classifier = NLPThreatClassifier(TextNormalizer.from_config(config))
+    risk_calculator = MultiFactorRiskCalculator()
+
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    depths = [int(d) for d in args.depths.split(',')]
+
+    overall = defaultdict(list)
+    per_config = defaultdict(lambda: defaultdict(list))
+
+    for page_id, kind, size, depth, html in generate_corpus(sizes, depths, args.pages_per_config, args.seed):
+        samples = defaultdict(list)
+
+        document = timed(samples, 'parse', ParsedDocument, html,
+                         parser=dom_analyzer.parser, max_depth_cap=dom_analyzer.max_depth)
+        dom_results = timed(samples, 'dom', dom_analyzer.analyze, document)
+
+        hidden_text = ' '.join(el['text'] for el in dom_results['hidden_elements'])
+        nlp_visible = timed(samples, 'nlp', nlp_classifier.classify_text, document.visible_text, 'visible')
+        nlp_hidden = nlp_classifier.classify_text(hidden_text, context='hidden')
+        nlp_results = mediator._combine_nlp_results(nlp_visible, nlp_hidden)
+
+        timed(samples, 'risk', risk_calculator.calculate_risk, dom_results, nlp_results)
+        timed(samples, 'end_to_end', mediator.analyze_page, html, args.goal)
+
+        config_key = f"{size}B/depth{depth}"
+        for layer, values in samples.items():
+            overall[layer].extend(values)
+            per_config[config_key][layer].extend(values)
+
+    sla_ms = config.get('max_latency_ms', 500)
+    end_to_end = latency_summary(overall['end_to_end'])
+
+    return {
+        'corpus': {
+            'sizes': sizes,
+            'depths': depths,
+            'pages_per_config': args.pages_per_config,
+            'pages': len(overall['end_to_end']),
+        },
+        'dom_parser': dom_analyzer.parser,
+        'llm_latency_ms': args.llm_latency_ms,
+        'llm_calls': llm_client.calls,
+        'layers': {layer: latency_summary(values) for layer, values in overall.items()},
+        'by_config': {
+            key: {layer: latency_summary(values) for layer, values in layers.items()}
+            for key, layers in per_config.items()
+        },
+        'peak_rss_mb': peak_rss_mb(),
+        'sla': {
+            'max_latency_ms': sla_ms,
+            'p95_ms': end_to_end.get('p95_ms', 0.0),
+            'passed': end_to_end.get('p95_ms', 0.0) <= sla_ms,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10KB,100KB,1MB', help='page sizes, e.g. 10KB,1MB,10MB')
+    parser.add_argument('--depths', default='8,64', help='DOM nesting depths')
+    parser.add_argument('--pages-per-config', type=int, default=3, help='pages per size/depth/kind')
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='simulated Gemini latency')
+    parser.add_argument('--goal', default='Buy a laptop', help='agent goal passed to analyze_page')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"✅ Report written to {args.output}")
+    else:
+        print(text)
+
+    if not report['sla']['passed']:
+        print(f"❌ p95 {report['sla']['p95_ms']} ms exceeds the {report['sla']['max_latency_ms']} ms SLA",
+              file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
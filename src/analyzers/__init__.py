@@ -2,12 +2,17 @@
 Analysis modules: DOM, NLP, and LLM-based threat detection
 """
 
+from analyzers.parsed_document import ParsedDocument, resolve_parser
 from analyzers.dom_analyzer import DOMAnalyzer
 from analyzers.nlp_classifier import NLPThreatClassifier
 from analyzers.llm_reasoner import LLMThreatReasoner
+from analyzers.streaming_analyzer import StreamingPageAnalyzer
 
 __all__ = [
+    'ParsedDocument',
+    'resolve_parser',
     'DOMAnalyzer',
     'NLPThreatClassifier',
-    'LLMThreatReasoner'
+    'LLMThreatReasoner',
+    'StreamingPageAnalyzer'
 ]
\ No newline at end of file
@@ -1,106 +1,270 @@
-from bs4 import BeautifulSoup
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from analyzers.parsed_document import ParsedDocument, DEFAULT_PARSER, DEFAULT_MAX_DEPTH, resolve_parser
+from analyzers.style_resolver import StyleResolver, hiding_method, inline_values
+from utils.performance_monitor import StageTimer
 
 
 class DOMAnalyzer:
     """Fast, rule-based DOM structure analysis"""
 
-    SUSPICIOUS_PATTERNS = {
-        'hidden_styles': ['display:none', 'visibility:hidden', 'opacity:0'],
-        'offscreen': ['left:-9999px', 'top:-9999px', 'position:absolute'],
-        'tiny_fonts': ['font-size:0', 'font-size:1px'],
-        'color_hiding': ['color:white', 'color:#ffffff'],
-    }
+    DANGEROUS_SCRIPT_PATTERNS = [
+        'eval(', 'innerHTML', 'document.write',
+        'setTimeout', 'setInterval', 'Function('
+    ]
 
-    def __init__(self):
+    def __init__(self, parser: str = DEFAULT_PARSER, max_depth: int = DEFAULT_MAX_DEPTH):
         self.threat_indicators = []
+        self.parser = resolve_parser(parser)
+        self.max_depth = max_depth
 
-    def analyze(self, page_content: str) -> Dict:
+    def analyze(self, page_content: Union[str, ParsedDocument],
+                timer: Optional[StageTimer] = None) -> Dict:
         """
         Fast DOM analysis - runs in <50ms for typical pages
+
+        Accepts raw HTML or a ParsedDocument shared with other layers.
+        When a timer is given, parsing and each detector get their own span.
         """
-        soup = BeautifulSoup(page_content, 'html.parser')
+        timer = timer or StageTimer()
+
+        if isinstance(page_content, ParsedDocument):
+            document = page_content
+        else:
+            document = timer.run('parse', ParsedDocument, page_content,
+                                 parser=self.parser, max_depth_cap=self.max_depth)
 
         results = {
-            'hidden_elements': self._find_hidden_elements(soup),
-            'suspicious_forms': self._analyze_forms(soup),
-            'external_resources': self._check_external_resources(soup),
-            'iframe_analysis': self._analyze_iframes(soup),
-            'script_analysis': self._analyze_scripts(soup),
-            'dom_complexity': self._calculate_complexity(soup),
+            'hidden_elements': timer.run('dom.hidden_elements', self._find_hidden_elements, document),
+            'suspicious_forms': timer.run('dom.forms', self._analyze_forms, document),
+            'external_resources': timer.run('dom.external_resources', self._check_external_resources, document),
+            'iframe_analysis': timer.run('dom.iframes', self._analyze_iframes, document),
+            'script_analysis': timer.run('dom.scripts', self._analyze_scripts, document),
+            'dom_complexity': timer.run('dom.complexity', self._calculate_complexity, document),
         }
 
         return results
 
-    def _find_hidden_elements(self, soup) -> List[Dict]:
-        """Detect hidden content using multiple techniques"""
-        hidden_elements = []
+    def analyze_features(self, features: Dict, timer: Optional[StageTimer] = None) -> Dict:
+        """
+        Score a feature record extracted in the browser (core.browser_scripts.EXTRACT_FEATURES_JS)
 
-        for element in soup.find_all(True):
-            style = element.get('style', '').lower()
+        Same result shape as analyze(), but nothing is parsed: hiding
+        methods come from computed styles and the counts from the live DOM.
+        """
+        timer = timer or StageTimer()
+
+        with timer.span('dom.hidden_elements'):
+            hidden_elements = [
+                {
+                    'tag': record['tag'],
+                    'text': record['text'],
+                    'method': record['method'],
+                    'severity': self._calculate_hiding_severity(record['method'], record['text']),
+                    'path': record.get('path', '')
+                }
+                for record in features['hidden']
+            ]
+
+        with timer.span('dom.forms'):
+            suspicious_forms = [
+                form for form in (
+                    self._score_form(record['action'], record['method'].lower(),
+                                     record['has_password'], record['has_email'])
+                    for record in features['forms']
+                )
+                if form is not None
+            ]
+
+        with timer.span('dom.external_resources'):
+            external_resources = [
+                {'tag': record['tag'], 'src': record['src']}
+                for record in features['resources'] if self._is_external_url(record['src'])
+            ]
+
+        with timer.span('dom.iframes'):
+            iframes = [self._score_iframe(record['src'], record['sandbox']) for record in features['iframes']]
+
+        with timer.span('dom.scripts'):
+            scripts = features['scripts']
+            external_sources = [record['src'] for record in scripts if record['src']]
+            script_analysis = {
+                'total_scripts': len(scripts),
+                'inline_scripts': len(scripts) - len(external_sources),
+                'external_scripts': len(external_sources),
+                'risky_inline_count': sum(1 for record in scripts if record['risky']),
+                'external_sources': external_sources
+            }
+
+        with timer.span('dom.complexity'):
+            complexity = dict(features['complexity'])
+            complexity['depth_limit_exceeded'] = complexity['max_depth'] > self.max_depth
 
-            is_hidden = any(p in style for p in self.SUSPICIOUS_PATTERNS['hidden_styles'])
-            is_offscreen = any(p in style for p in self.SUSPICIOUS_PATTERNS['offscreen'])
-            is_tiny = any(p in style for p in self.SUSPICIOUS_PATTERNS['tiny_fonts'])
+        return {
+            'hidden_elements': hidden_elements,
+            'suspicious_forms': suspicious_forms,
+            'external_resources': external_resources,
+            'iframe_analysis': iframes,
+            'script_analysis': script_analysis,
+            'dom_complexity': complexity,
+        }
+
+    def _find_hidden_elements(self, document: ParsedDocument) -> List[Dict]:
+        """
+        Detect hidden content - inline styles, <style> rules and the hidden attribute
 
-            if is_hidden or is_offscreen or is_tiny:
-                text_content = element.get_text(strip=True)
-                if text_content:
-                    hidden_elements.append({
-                        'tag': element.name,
-                        'text': text_content,
-                        'method': self._categorize_hiding_method(style),
-                        'severity': self._calculate_hiding_severity(style, text_content)
-                    })
+        Only the outermost hidden element on a path is reported, with the
+        path to it; its text nodes are collected once each (script/style
+        excluded) and nothing inside it is examined again. Linear in the
+        size of the DOM.
+        """
+        resolver = StyleResolver((sheet.get_text() for sheet in document.stylesheets), self.max_depth)
+        hidden_elements = []
+        covered = set()
+
+        for element, method, path in self._hidden_roots(document, resolver, covered):
+            text_content = self._collect_hidden_text(element, document, covered)
+            if text_content:
+                hidden_elements.append({
+                    'tag': element.name,
+                    'text': text_content,
+                    'method': method,
+                    'severity': self._calculate_hiding_severity(method, text_content),
+                    'path': path
+                })
 
         return hidden_elements
 
-    def _analyze_forms(self, soup) -> List[Dict]:
+    def _collect_hidden_text(self, root, document: ParsedDocument, covered: set) -> str:
+        """Text of a hidden subtree, one entry per text node; marks its elements as covered"""
+        parts = []
+        for node in root.descendants:
+            if hasattr(node, 'children'):
+                covered.add(id(node))
+            elif type(node) in document.TEXT_TYPES and node.parent.name not in document.NON_VISIBLE_TAGS:
+                text = node.strip()
+                if text:
+                    parts.append(text)
+        return ' '.join(parts)
+
+    def _hidden_roots(self, document: ParsedDocument, resolver: StyleResolver,
+                      covered: set) -> Iterator[Tuple]:
+        """
+        (element, hiding method, path) for each outermost hidden element, in
+        document order. covered holds the ids of elements inside roots already
+        yielded (filled by the caller before it asks for the next root).
+        """
+        if not resolver.has_rules:
+            # Without stylesheet rules only elements with a style or hidden
+            # attribute can be hidden - no need to visit the rest
+            for element in document.styled_elements:
+                if id(element) in covered:
+                    continue
+                method = hiding_method(resolver.resolve(element, ()))
+                if method is not None:
+                    chain = [parent for parent in element.parents if parent.parent is not None]
+                    yield element, method, self._element_path(reversed(chain), element)
+            return
+
+        # One top-down pass; a hidden element's subtree is skipped
+        levels = [iter(document.soup.contents)]
+        ancestors = []
+        while levels:
+            node = next(levels[-1], None)
+
+            if node is None:
+                levels.pop()
+                if levels:
+                    ancestors.pop()
+                continue
+
+            if not hasattr(node, 'children') or node.name in document.NON_VISIBLE_TAGS:
+                continue
+
+            method = hiding_method(resolver.resolve(node, ancestors))
+            if method is not None:
+                yield node, method, self._element_path(ancestors, node)
+                continue
+
+            if node.contents:
+                ancestors.append(node)
+                levels.append(iter(node.contents))
+
+    @staticmethod
+    def _element_path(ancestors, element) -> str:
+        """
+        e.g. 'div#main > p.note' (id, else first class)
+
+        Skeleton ancestors (html, head, body) are left out - lxml and html5lib
+        synthesize them, html.parser does not - so the path is the same on
+        every backend and in the browser.
+        """
+        segments = []
+        for node in [node for node in ancestors if node.name not in ParsedDocument.SKELETON_TAGS] + [element]:
+            segment = node.name
+            if node.get('id'):
+                segment += f"#{node['id']}"
+            elif node.get('class'):
+                segment += f".{node['class'][0]}"
+            segments.append(segment)
+        return ' > '.join(segments)
+
+    def is_hidden_style(self, style: str) -> bool:
+        """Does an inline style hide its element?"""
+        return hiding_method(inline_values(style)) is not None
+
+    def _analyze_forms(self, document: ParsedDocument) -> List[Dict]:
         """Analyze forms for phishing indicators"""
         suspicious_forms = []
 
-        for form in soup.find_all('form'):
-            action = form.get('action', '')
-            method = form.get('method', 'get').lower()
+        for record in document.forms:
+            form = record['tag']
+            scored = self._score_form(
+                form.get('action', ''), form.get('method', 'get').lower(),
+                record['has_password'], record['has_email']
+            )
+            if scored is not None:
+                suspicious_forms.append(scored)
 
-            is_external = self._is_external_url(action)
-            has_password = bool(form.find('input', {'type': 'password'}))
-            has_email = bool(form.find('input', {'type': 'email'}))
+        return suspicious_forms
 
-            risk_score = 0.0
-            indicators = []
+    def _score_form(self, action: str, method: str, has_password: bool, has_email: bool) -> Optional[Dict]:
+        """Phishing indicators of one form; None unless it asks for a password or email"""
+        is_external = self._is_external_url(action)
 
-            if is_external and has_password:
-                risk_score += 0.6
-                indicators.append('external_password_submission')
+        risk_score = 0.0
+        indicators = []
 
-            if action.startswith('javascript:'):
-                risk_score += 0.4
-                indicators.append('javascript_action')
+        if is_external and has_password:
+            risk_score += 0.6
+            indicators.append('external_password_submission')
 
-            if not action or action == '#':
-                risk_score += 0.2
-                indicators.append('no_action_url')
+        if action.startswith('javascript:'):
+            risk_score += 0.4
+            indicators.append('javascript_action')
 
-            if has_password or has_email:
-                suspicious_forms.append({
-                    'action': action,
-                    'method': method,
-                    'has_password': has_password,
-                    'has_email': has_email,
-                    'is_external': is_external,
-                    'risk_score': min(risk_score, 1.0),
-                    'indicators': indicators
-                })
+        if not action or action == '#':
+            risk_score += 0.2
+            indicators.append('no_action_url')
 
-        return suspicious_forms
+        if not (has_password or has_email):
+            return None
 
-    def _check_external_resources(self, soup) -> List[Dict]:
+        return {
+            'action': action,
+            'method': method,
+            'has_password': has_password,
+            'has_email': has_email,
+            'is_external': is_external,
+            'risk_score': min(risk_score, 1.0),
+            'indicators': indicators
+        }
+
+    def _check_external_resources(self, document: ParsedDocument) -> List[Dict]:
         """Detect external scripts, iframes, images, and links"""
         external = []
 
-        for tag in soup.find_all(['script', 'iframe', 'img', 'link']):
+        for tag in document.resources:
             src = tag.get('src') or tag.get('href')
             if src and self._is_external_url(src):
                 external.append({
@@ -110,39 +274,34 @@ class DOMAnalyzer:
 
         return external
 
-    def _analyze_iframes(self, soup) -> List[Dict]:
+    def _analyze_iframes(self, document: ParsedDocument) -> List[Dict]:
         """Detect potentially malicious iframes"""
         iframes = []
 
-        for iframe in soup.find_all('iframe'):
-            src = iframe.get('src', '')
-            sandbox = iframe.get('sandbox', '')
-
-            iframes.append({
-                'src': src,
-                'is_external': self._is_external_url(src),
-                'has_sandbox': bool(sandbox),
-                'risk_level': 'high' if self._is_external_url(src) and not sandbox else 'medium'
-            })
+        for iframe in document.iframes:
+            iframes.append(self._score_iframe(iframe.get('src', ''), iframe.get('sandbox', '')))
 
         return iframes
 
-    def _analyze_scripts(self, soup) -> Dict:
+    def _score_iframe(self, src: str, sandbox: str) -> Dict:
+        return {
+            'src': src,
+            'is_external': self._is_external_url(src),
+            'has_sandbox': bool(sandbox),
+            'risk_level': 'high' if self._is_external_url(src) and not sandbox else 'medium'
+        }
+
+    def _analyze_scripts(self, document: ParsedDocument) -> Dict:
         """Analyze JavaScript for dynamic injection risks"""
-        scripts = soup.find_all('script')
+        scripts = document.scripts
 
         inline_scripts = [s for s in scripts if not s.get('src')]
         external_scripts = [s for s in scripts if s.get('src')]
 
-        dangerous_patterns = [
-            'eval(', 'innerHTML', 'document.write',
-            'setTimeout', 'setInterval', 'Function('
-        ]
-
         risky_inline = []
         for script in inline_scripts:
             content = script.string or ''
-            if any(p in content for p in dangerous_patterns):
+            if any(p in content for p in self.DANGEROUS_SCRIPT_PATTERNS):
                 risky_inline.append(content[:200])
 
         return {
@@ -159,43 +318,21 @@ class DOMAnalyzer:
             return False
         return url.startswith('http://') or url.startswith('https://')
 
-    def _calculate_complexity(self, soup) -> Dict:
-        """Calculate DOM complexity metrics"""
+    def _calculate_complexity(self, document: ParsedDocument) -> Dict:
+        """Calculate DOM complexity metrics (counted during the tree walk)"""
         return {
-            'total_elements': len(soup.find_all(True)),
-            'max_depth': self._get_max_depth(soup),
-            'form_count': len(soup.find_all('form')),
-            'input_count': len(soup.find_all('input')),
-            'button_count': len(soup.find_all('button')),
+            'total_elements': document.element_count,
+            'max_depth': document.max_depth,
+            'depth_limit_exceeded': document.depth_limit_exceeded,
+            'form_count': len(document.forms),
+            'input_count': document.input_count,
+            'button_count': document.button_count,
         }
 
-    def _get_max_depth(self, element, depth=0) -> int:
-        """Calculate maximum DOM tree depth"""
-        if not hasattr(element, 'children'):
-            return depth
-
-        depths = [
-            self._get_max_depth(child, depth + 1)
-            for child in element.children
-            if hasattr(child, 'children')
-        ]
-
-        return max(depths, default=depth)
-
     def _categorize_hiding_method(self, style: str) -> str:
-        if 'display:none' in style:
-            return 'display_none'
-        if 'visibility:hidden' in style:
-            return 'visibility_hidden'
-        if 'opacity:0' in style:
-            return 'opacity_zero'
-        if 'left:-' in style or 'top:-' in style:
-            return 'offscreen_positioning'
-        if 'font-size:0' in style or 'font-size:1px' in style:
-            return 'tiny_font'
-        return 'unknown'
-
-    def _calculate_hiding_severity(self, style: str, text: str) -> str:
+        return hiding_method(inline_values(style)) or 'unknown'
+
+    def _calculate_hiding_severity(self, method: str, text: str) -> str:
         text_lower = text.lower()
 
         high_severity_keywords = [
@@ -0,0 +1,303 @@
+import asyncio
+import itertools
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class RateLimitExceeded(Exception):
+    """The LLM kept answering 429 / RESOURCE_EXHAUSTED after every retry"""
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The LLM did not answer within the latency budget it was given"""
+
+
+class LLMRequestDiscarded(Exception):
+    """The caller withdrew the request before the LLM answered (e.g. an unneeded speculative call)"""
+
+
+class TokenBucket:
+    """Refills at rate per second up to capacity; thread-safe"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount tokens are available (0 if they are now)"""
+        with self._lock:
+            self._refill()
+            # A request larger than the bucket only has to wait for a full bucket
+            missing = min(amount, self.capacity) - self._tokens
+            return max(missing, 0.0) / self.rate
+
+    def take(self, amount: float):
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+
+
+class LLMRequestScheduler:
+    """
+    Single gateway for LLM requests
+
+    - identical in-flight requests are coalesced into one call (single-flight)
+    - at most max_concurrency calls run at once
+    - requests per second and tokens per minute are held under their limits
+    - lower priority values go first, so action validation jumps ahead of
+      background page scans (also when it joins a scan already queued)
+    - rate-limit errors are retried with exponential backoff, pausing all
+      dispatch meanwhile, and surface as RateLimitExceeded when retries run out
+    - requests every caller has abandoned (deadline passed) are never sent
+    """
+
+    PRIORITY_ACTION = 0
+    PRIORITY_SCAN = 1
+
+    # How long the dispatcher sleeps while waiting for a slot or tokens
+    POLL_SECONDS = 0.05
+
+    def __init__(self, max_concurrency: int = 4,
+                 requests_per_second: Optional[float] = None, burst: Optional[int] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 3, backoff_seconds: float = 1.0):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self.request_bucket = TokenBucket(requests_per_second, burst or max(1, int(requests_per_second))) \
+            if requests_per_second else None
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute) \
+            if tokens_per_minute else None
+
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._slots = threading.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm-call')
+        self._in_flight: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._dispatcher: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.stats = {
+            'submitted': 0,
+            'coalesced': 0,
+            'sent': 0,
+            'rate_limit_retries': 0,
+            'failed': 0,
+            'abandoned': 0,
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['LLMRequestScheduler']:
+        """Build from the llm_scheduler block of config.yaml; None when disabled"""
+        settings = config.get('llm_scheduler') or {}
+        if not settings.get('enabled', True):
+            return None
+
+        return cls(
+            max_concurrency=settings.get('max_concurrency', 4),
+            requests_per_second=settings.get('requests_per_second'),
+            burst=settings.get('burst'),
+            tokens_per_minute=settings.get('tokens_per_minute'),
+            max_retries=settings.get('max_retries', 3),
+            backoff_seconds=settings.get('backoff_seconds', 1.0)
+        )
+
+    def submit(self, key: str, call: Callable[[Optional[float]], str], priority: int = PRIORITY_SCAN,
+               tokens: int = 0, deadline: Optional[float] = None) -> Future:
+        """
+        Queue call(deadline) and return a Future for its result
+
+        Requests with the same key while one is in flight share that
+        request's Future instead of calling the LLM again. The shared call
+        gets the latest deadline (time.monotonic()) of its callers - None
+        if any caller has none - and runs at the most urgent priority among
+        them; each caller still waits only as long as its own budget allows.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("LLMRequestScheduler is closed")
+
+            self.stats['submitted'] += 1
+            job = self._in_flight.get(key)
+            if job is not None:
+                self.stats['coalesced'] += 1
+                job['waiters'] += 1
+                if job['deadline'] is not None:
+                    job['deadline'] = None if deadline is None else max(job['deadline'], deadline)
+                if priority >= job['priority']:
+                    return job['future']
+                job['priority'] = priority
+                if job['state'] != 'queued':
+                    return job['future']
+                # Queued at the new priority; the old entry is skipped when it comes up
+            else:
+                job = {'key': key, 'call': call, 'tokens': tokens, 'future': Future(),
+                       'attempt': 0, 'waiters': 1, 'deadline': deadline,
+                       'priority': priority, 'state': 'queued'}
+                self._in_flight[key] = job
+
+                if self._dispatcher is None:
+                    self._dispatcher = threading.Thread(target=self._dispatch, name='llm-dispatch', daemon=True)
+                    self._dispatcher.start()
+
+        self._queue.put((priority, next(self._sequence), job))
+        return job['future']
+
+    def abandon(self, key: str, future: Future):
+        """
+        A caller stopped waiting for the future submit gave it for key; once
+        every caller has, the request is dropped if it has not been sent yet
+        (a running call cannot be recalled, its answer is still delivered to
+        the Future). Matched on the Future: if that request already finished
+        and a new one for the same key is in flight, nothing changes.
+        """
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None and job['future'] is future:
+                job['waiters'] -= 1
+
+    async def submit_async(self, key: str, call: Callable[[Optional[float]], str], priority: int = PRIORITY_SCAN,
+                           tokens: int = 0, deadline: Optional[float] = None) -> str:
+        return await asyncio.wrap_future(self.submit(key, call, priority, tokens, deadline))
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            priority, sequence, job = item
+            if job is None:
+                return
+
+            with self._lock:
+                # Sent already, or queued again at a higher priority since
+                stale = job['state'] != 'queued' or priority != job['priority']
+            if stale:
+                continue
+
+            if self._drop_if_abandoned(job):
+                continue
+
+            # Not ready yet - put it back, so a more urgent request arriving
+            # meanwhile can overtake it
+            wait = self._wait_time(job['tokens'])
+            if wait > 0:
+                self._queue.put(item)
+                time.sleep(min(wait, self.POLL_SECONDS))
+                continue
+
+            if not self._slots.acquire(timeout=self.POLL_SECONDS):
+                self._queue.put(item)
+                continue
+
+            # Its last caller may have left while this waited for the slot
+            if self._drop_if_abandoned(job):
+                self._slots.release()
+                continue
+
+            if self.request_bucket is not None:
+                self.request_bucket.take(1)
+            if self.token_bucket is not None:
+                self.token_bucket.take(job['tokens'])
+
+            with self._lock:
+                job['state'] = 'running'
+            self._executor.submit(self._run, job)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = self._paused_until - time.monotonic()
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.wait_time(tokens))
+        return max(wait, 0.0)
+
+    def _run(self, job: Dict):
+        with self._lock:
+            self.stats['sent'] += 1
+            deadline = job['deadline']
+
+        try:
+            result = job['call'](deadline)
+        except Exception as e:
+            if self.is_rate_limit_error(e) and job['attempt'] < self.max_retries:
+                self._retry_later(job)
+                return
+            if self.is_rate_limit_error(e):
+                e = RateLimitExceeded(f"LLM rate limit persisted after {job['attempt']} retries: {e}")
+            self._finish(job, error=e)
+        else:
+            self._finish(job, result=result)
+        finally:
+            self._slots.release()
+
+    def _retry_later(self, job: Dict):
+        """Back off (everyone, not just this request) and queue the job again"""
+        delay = self.backoff_seconds * (2 ** job['attempt']) * random.uniform(0.8, 1.2)
+        job['attempt'] += 1
+        with self._lock:
+            self.stats['rate_limit_retries'] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            job['state'] = 'queued'
+            priority = job['priority']
+        self._queue.put((priority, next(self._sequence), job))
+
+    def _drop_if_abandoned(self, job: Dict) -> bool:
+        with self._lock:
+            if job['waiters'] > 0:
+                return False
+            self._in_flight.pop(job['key'], None)
+            self.stats['abandoned'] += 1
+
+        job['future'].cancel()
+        return True
+
+    def _finish(self, job: Dict, result: Optional[str] = None, error: Optional[Exception] = None):
+        with self._lock:
+            self._in_flight.pop(job['key'], None)
+            if error is not None:
+                self.stats['failed'] += 1
+
+        if error is not None:
+            job['future'].set_exception(error)
+        else:
+            job['future'].set_result(result)
+
+    @staticmethod
+    def is_rate_limit_error(error: Exception) -> bool:
+        """429 / RESOURCE_EXHAUSTED from Gemini (google.api_core) or an HTTP client"""
+        if getattr(error, 'code', None) == 429 or getattr(error, 'status_code', None) == 429:
+            return True
+        if type(error).__name__ in ('ResourceExhausted', 'TooManyRequests'):
+            return True
+        message = str(error)
+        return '429' in message or 'RESOURCE_EXHAUSTED' in message
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._in_flight)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            dispatcher = self._dispatcher
+        if dispatcher is not None:
+            # Sorts after every real job
+            self._queue.put((float('inf'), next(self._sequence), None))
+        self._executor.shutdown(wait=False)
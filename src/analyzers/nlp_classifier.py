@@ -1,7 +1,43 @@
 
+import random
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from analyzers.text_normalizer import TextNormalizer
+
+# Per-process classifier used by classify_batch worker pools
+_worker_classifier = None
+
+
+def _init_batch_worker(classifier_cls, args):
+    global _worker_classifier
+    _worker_classifier = classifier_cls(*args)
+
+
+def _classify_chunk(items: List[Tuple[str, str]]) -> List[Dict]:
+    return [_worker_classifier.classify_text(text, context) for text, context in items]
+
+
+class _Reservoir:
+    """Uniform fixed-size sample of a stream of matches (Algorithm R)"""
+
+    def __init__(self, size: int, rng: random.Random):
+        self.size = size
+        self.rng = rng
+        self.seen = 0
+        self.items: List[Dict] = []
+
+    def slot(self) -> Optional[int]:
+        """Count one more match; the index to store it at, or None to drop it"""
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(None)
+            return len(self.items) - 1
+        index = self.rng.randrange(self.seen)
+        return index if index < self.size else None
+
 
 class NLPThreatClassifier:
     """
@@ -58,8 +94,21 @@ class NLPThreatClassifier:
         r'urgent\s+action\s+required',
     ]
     
-    def __init__(self):
+    # Characters that IGNORECASE matches to ASCII letters but str.lower() does not
+    CASE_FOLD_FIXES = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+    
+    # Regex escapes that stand for a literal character
+    LITERAL_ESCAPES = set('|[]().*+?{}<>:-/\\')
+    
+    def __init__(self, normalizer: Optional[TextNormalizer] = None,
+                 samples_per_category: int = 5, sample_seed: int = 0):
+        self.normalizer = normalizer or TextNormalizer()
+        # Matches are counted per category; only this many are kept as examples
+        self.samples_per_category = samples_per_category
+        self.sample_seed = sample_seed
         self.compiled_patterns = self._compile_patterns()
+        self.combined_pattern, self.pattern_index, self.anchor_groups = self._compile_scanner()
+        self.categories = list(dict.fromkeys(category for category, _ in self.pattern_index))
     
     def _compile_patterns(self) -> Dict:
         """Pre-compile regex patterns for performance"""
@@ -75,6 +124,163 @@ class NLPThreatClassifier:
         
         return compiled
     
+    def _compile_scanner(self) -> Tuple:
+        """
+        Build the single-pass scanning engine
+        
+        Every pattern starts with a literal word ('ignore', 'system', ...).
+        The scan finds anchor occurrences with plain substring search over a
+        lowercased copy, then confirms only the patterns sharing that anchor at
+        each occurrence. A combined alternation of all patterns is kept for
+        texts whose lowercased form changes length.
+        
+        Returns (combined regex, [(category, pattern)], {anchor: [index]})
+        """
+        pattern_index = []
+        alternatives = []
+        anchor_groups = {}
+        
+        for category, patterns in self.compiled_patterns.items():
+            for pattern in patterns:
+                index = len(pattern_index)
+                pattern_index.append((category, pattern))
+                alternatives.append(f'(?:{pattern.pattern})')
+                
+                anchor = self._literal_prefix(pattern.pattern).lower()
+                if anchor:
+                    anchor_groups.setdefault(anchor, []).append(index)
+        
+        combined = re.compile('|'.join(alternatives), re.IGNORECASE)
+        return combined, pattern_index, anchor_groups
+    
+    @classmethod
+    def _literal_prefix(cls, pattern: str) -> str:
+        """Leading literal characters of a regex (stops at the first metacharacter)"""
+        prefix = []
+        i = 0
+        while i < len(pattern):
+            char = pattern[i]
+            if char == '\\' and i + 1 < len(pattern) and pattern[i + 1] in cls.LITERAL_ESCAPES:
+                prefix.append(pattern[i + 1])
+                i += 2
+                continue
+            if char in '\\.^$*+?{}[]|()':
+                break
+            prefix.append(char)
+            i += 1
+        
+        # A quantifier after the prefix makes its last character optional
+        if i < len(pattern) and pattern[i] in '*?{' and prefix:
+            prefix.pop()
+        
+        return ''.join(prefix)
+    
+    def _fold_case(self, text: str):
+        """Lowercased copy with the same offsets as text, or None if impossible"""
+        if text.isascii():
+            return text.lower()
+        
+        folded = text.translate(self.CASE_FOLD_FIXES).lower()
+        return folded if len(folded) == len(text) else None
+    
+    def scan(self, text: str, start: int = 0, end: Optional[int] = None) -> Dict[str, List]:
+        """
+        Single-pass multi-pattern scan
+        
+        Candidate start positions come from one anchor search; each pattern is
+        then confirmed at its candidates only. This gives exactly what running
+        findall for each pattern separately would, without rescanning the text
+        once per pattern.
+        
+        Only matches starting in text[start:end] are reported (the rest of
+        a chunk is context shared with its neighbours).
+        
+        Returns matches per category (categories without matches omitted)
+        """
+        pattern_index = self.pattern_index
+        matches_by_category = {}
+        for i, _, value in self._iter_matches(text, start, end):
+            matches_by_category.setdefault(pattern_index[i][0], []).append(value)
+        
+        return matches_by_category
+    
+    def _iter_matches(self, text: str, start: int = 0, end: Optional[int] = None,
+                      resume: Optional[List[int]] = None) -> Iterator[Tuple[int, int, object]]:
+        """
+        (pattern number, position, findall value) - pattern by pattern, in text order
+        
+        resume holds, per pattern, the position where its next match may
+        start (the end of its previous match, found in an earlier chunk);
+        it is updated in place so the next chunk carries on from there.
+        """
+        if end is None:
+            end = len(text)
+        candidates = self._candidate_positions(text)
+        
+        for i, (category, pattern) in enumerate(self.pattern_index):
+            last_end = resume[i] if resume is not None else 0
+            positions = candidates[i]
+            if positions is None:
+                # No usable anchor - plain scan for this pattern
+                for match in pattern.finditer(text, last_end):
+                    if match.start() >= end:
+                        break
+                    if match.start() >= start:
+                        yield i, match.start(), self._findall_value(match)
+                    last_end = max(match.end(), match.start() + 1)
+            else:
+                for position in positions:
+                    if position >= end:
+                        break
+                    # findall never returns overlapping matches of the same pattern
+                    if position < last_end:
+                        continue
+                    match = pattern.match(text, position)
+                    if match:
+                        if position >= start:
+                            yield i, position, self._findall_value(match)
+                        last_end = max(match.end(), position + 1)
+            if resume is not None:
+                resume[i] = last_end
+    
+    def _candidate_positions(self, text: str) -> List:
+        """Sorted start positions worth confirming, per pattern (None = scan fully)"""
+        folded = self._fold_case(text)
+        
+        if folded is None:
+            # Offsets would not line up - let the combined regex find every start
+            starts = []
+            search = self.combined_pattern.search
+            hit = search(text)
+            while hit is not None:
+                starts.append(hit.start())
+                hit = search(text, hit.start() + 1)
+            return [starts] * len(self.pattern_index)
+        
+        candidates = [None] * len(self.pattern_index)
+        
+        find = folded.find
+        for anchor, indices in self.anchor_groups.items():
+            positions = []
+            position = find(anchor)
+            while position != -1:
+                positions.append(position)
+                position = find(anchor, position + 1)
+            for i in indices:
+                candidates[i] = positions
+        
+        return candidates
+    
+    @staticmethod
+    def _findall_value(match):
+        """What re.findall would report for this match"""
+        groups = match.groups('')
+        if not groups:
+            return match.group(0)
+        if len(groups) == 1:
+            return groups[0]
+        return groups
+    
     def classify_text(self, text: str, context: str = 'visible') -> Dict:
         """
         Classify text content for threats
@@ -91,23 +297,47 @@ class NLPThreatClassifier:
             'confidence': 0.0,
             'threats': [],
             'matched_patterns': [],
-            'severity': 'none'
+            'match_counts': {},
+            'match_samples': [],
+            'severity': 'none',
+            'truncated': False
         }
         
         if not text or len(text.strip()) == 0:
             return results
         
-        # Check each category
-        for category, patterns in self.compiled_patterns.items():
-            matches = []
-            for pattern in patterns:
-                found = pattern.findall(text)
-                if found:
-                    matches.extend(found)
-            
-            if matches:
+        # Normalized chunk by chunk; each chunk is checked for every category in one pass.
+        # Every match is counted, but only a seeded random sample of them is kept
+        pattern_index = self.pattern_index
+        rng = random.Random(self.sample_seed)
+        reservoirs = {}
+        offset = 0
+        # Per pattern, where its next match may start in the normalized text -
+        # a match running into the next chunk's share hides the matches it overlaps
+        resume_at = [0] * len(pattern_index)
+        for chunk, start, end in self.normalizer.chunks(text):
+            base = offset - start
+            resume = [max(start, position - base) for position in resume_at]
+            for i, position, value in self._iter_matches(chunk, start, end, resume):
+                category = pattern_index[i][0]
+                reservoir = reservoirs.get(category)
+                if reservoir is None:
+                    reservoir = reservoirs[category] = _Reservoir(self.samples_per_category, rng)
+                slot = reservoir.slot()
+                if slot is not None:
+                    # Offset into the normalized text
+                    reservoir.items[slot] = {'category': category, 'match': value,
+                                             'offset': offset + position - start, 'context': context}
+            offset += end - start
+            resume_at = [base + position for position in resume]
+        results['truncated'] = self.normalizer.is_truncated(text)
+        
+        for category in self.categories:
+            if category in reservoirs:
                 results['threats'].append(category)
-                results['matched_patterns'].extend(matches)
+                results['match_counts'][category] = reservoirs[category].seen
+                results['match_samples'].extend(sorted(reservoirs[category].items, key=lambda sample: sample['offset']))
+        results['matched_patterns'] = [sample['match'] for sample in results['match_samples']]
         
         # Calculate confidence based on matches
         if results['threats']:
@@ -138,6 +368,50 @@ class NLPThreatClassifier:
         
         return results
     
+    def combine_matches(self, first: Dict, second: Dict) -> Dict:
+        """
+        Merge the match counters and samples of two results
+        
+        Each category keeps at most samples_per_category samples. Each side's
+        samples are a uniform sample of its matches, so drawing sides by their
+        matches not yet drawn (without replacement) gives a uniform sample of
+        all matches.
+        """
+        rng = random.Random(self.sample_seed)
+        counts = {}
+        samples = []
+        
+        for category in self.categories:
+            pools = []
+            for side, result in enumerate((first, second)):
+                pool = [(side, sample) for sample in result.get('match_samples', [])
+                        if sample['category'] == category]
+                count = result.get('match_counts', {}).get(category, 0)
+                if pool and count:
+                    pools.append([pool, count])
+            
+            total = sum(result.get('match_counts', {}).get(category, 0) for result in (first, second))
+            if not total:
+                continue
+            counts[category] = total
+            
+            chosen = []
+            while pools and len(chosen) < self.samples_per_category:
+                index = rng.choices(range(len(pools)), weights=[remaining for _, remaining in pools])[0]
+                pool = pools[index][0]
+                chosen.append(pool.pop(rng.randrange(len(pool))))
+                pools[index][1] -= 1
+                if not pool or not pools[index][1]:
+                    pools.pop(index)
+            # First result's samples first, each side in text order
+            samples.extend(sample for _, sample in sorted(chosen, key=lambda item: (item[0], item[1]['offset'])))
+        
+        return {
+            'matched_patterns': [sample['match'] for sample in samples],
+            'match_counts': counts,
+            'match_samples': samples
+        }
+    
     def analyze_text_structure(self, text: str) -> Dict:
         """Analyze text structure for anomalies"""
         return {
@@ -164,3 +438,67 @@ class NLPThreatClassifier:
             return 0.0
         punct = len([c for c in text if c in '!?.:;,'])
         return punct / len(text)
+    
+    def classify_batch(self,
+                       texts: Sequence[str],
+                       contexts: Union[str, Sequence[str], None] = None,
+                       workers: int = 0,
+                       chunk_size: int = 256) -> List[Dict]:
+        """
+        Classify many text blocks in one call
+        
+        Args:
+            texts: Text blocks to analyze
+            contexts: One context for all blocks, or one per block (default 'visible')
+            workers: Spread the work over this many processes (0/1 = in-process)
+            chunk_size: Blocks sent to a worker at a time
+        
+        Returns:
+            One result per block, identical to calling classify_text on each
+        """
+        contexts = self._batch_contexts(texts, contexts)
+        
+        # Duplicate blocks (nav bars, footers, boilerplate) are classified once
+        unique = {}
+        order = [unique.setdefault(item, len(unique)) for item in zip(texts, contexts)]
+        items = list(unique)
+        
+        if workers > 1 and len(items) > chunk_size:
+            chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=_init_batch_worker,
+                                     initargs=(type(self), (self.normalizer, self.samples_per_category,
+                                                            self.sample_seed))) as pool:
+                classified = [result for chunk in pool.map(_classify_chunk, chunks)
+                              for result in chunk]
+        else:
+            classify = self.classify_text
+            classified = [classify(text, context) for text, context in items]
+        
+        # Every block gets its own result, even when its text was a duplicate
+        results = []
+        handed_out = [False] * len(classified)
+        for index in order:
+            result = classified[index]
+            if handed_out[index]:
+                result = dict(result,
+                              threats=list(result['threats']),
+                              matched_patterns=list(result['matched_patterns']),
+                              match_counts=dict(result['match_counts']),
+                              match_samples=[dict(sample) for sample in result['match_samples']])
+            handed_out[index] = True
+            results.append(result)
+        
+        return results
+    
+    def _batch_contexts(self, texts: Sequence[str],
+                        contexts: Union[str, Sequence[str], None]) -> List[str]:
+        if contexts is None:
+            return ['visible'] * len(texts)
+        if isinstance(contexts, str):
+            return [contexts] * len(texts)
+        
+        contexts = list(contexts)
+        if len(contexts) != len(texts):
+            raise ValueError(f"Got {len(contexts)} contexts for {len(texts)} texts")
+        return contexts
@@ -0,0 +1,227 @@
+import re
+import warnings
+from bs4 import BeautifulSoup, NavigableString, CData
+from bs4.builder import builder_registry
+from typing import Dict, List, Optional
+
+# Fastest first - lxml is C-backed, html.parser is always available
+PARSER_BACKENDS = ('lxml', 'html5lib', 'html.parser')
+DEFAULT_PARSER = 'lxml'
+
+# Nesting tracked precisely up to this depth; deeper subtrees are flattened
+DEFAULT_MAX_DEPTH = 256
+
+# Tags that decide where a backend puts a form's fields
+_FORM_CONTEXT_TAG = re.compile(r'<(/?)(form|table|td|th|caption)[\s/>]', re.IGNORECASE)
+
+
+def resolve_parser(name: str = DEFAULT_PARSER) -> str:
+    """Return a usable BeautifulSoup backend, falling back to html.parser"""
+    name = name or DEFAULT_PARSER
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown dom_parser '{name}' (expected one of {PARSER_BACKENDS})")
+
+    if builder_registry.lookup(name) is None:
+        warnings.warn(f"dom_parser '{name}' is not installed, using html.parser")
+        return 'html.parser'
+
+    return name
+
+
+def _forms_need_repair(page_content: str, parsed_forms: int) -> bool:
+    """Does the source nest forms, open one in table context, or hold forms the tree lost?"""
+    open_tags = []
+    forms = 0
+    for match in _FORM_CONTEXT_TAG.finditer(page_content):
+        closing, name = match.group(1), match.group(2).lower()
+        if closing:
+            if name in open_tags:
+                while open_tags.pop() != name:
+                    pass
+            continue
+
+        if name == 'form':
+            forms += 1
+            if 'form' in open_tags or open_tags and open_tags[-1] == 'table':
+                return True
+        open_tags.append(name)
+
+    return forms != parsed_forms
+
+
+class ParsedDocument:
+    """
+    HTML parsed once per page and indexed in a single tree walk
+    Shared by every security layer so no layer re-parses the page
+    """
+
+    # Tags whose text never reaches the user
+    NON_VISIBLE_TAGS = ('script', 'style')
+
+    # Only plain text nodes count as text (comments, doctypes, etc. do not)
+    TEXT_TYPES = (NavigableString, CData)
+
+    RESOURCE_TAGS = ('script', 'iframe', 'img', 'link')
+
+    # Document skeleton - lxml/html5lib always synthesize these, html.parser
+    # only keeps them when present in the source, so they are not counted
+    SKELETON_TAGS = ('html', 'head', 'body')
+
+    def __init__(self, page_content: str, parser: str = DEFAULT_PARSER,
+                 max_depth_cap: int = DEFAULT_MAX_DEPTH):
+        self.parser = resolve_parser(parser)
+        self.soup = BeautifulSoup(page_content, self.parser)
+        self.max_depth_cap = max_depth_cap
+
+        # Indexes filled by the tree walk (all in document order)
+        self.element_count = 0
+        self.max_depth = 0
+        self.depth_limit_exceeded = False
+        # Elements with a style or hidden attribute, and <style> blocks
+        self.styled_elements = []
+        self.stylesheets = []
+        self.forms: List[Dict] = []
+        self.scripts = []
+        self.iframes = []
+        self.resources = []
+        self.input_count = 0
+        self.button_count = 0
+
+        self._text_parts = []
+        self._visible_text = None
+
+        self._index()
+        self._reconcile_forms(page_content)
+
+    @property
+    def visible_text(self) -> str:
+        """Page text without script/style content"""
+        if self._visible_text is None:
+            self._visible_text = ' '.join(self._text_parts)
+        return self._visible_text
+
+    def _index(self):
+        """
+        Walk the tree once, collecting everything the detectors need
+
+        Iterative, keeping only one child iterator per open element - no
+        recursion and no temporary lists, so deeply nested pages cannot
+        exhaust the stack. Subtrees below max_depth_cap are still scanned for detectors,
+        but flattened so memory stays bounded by the cap.
+        """
+        # Each level: (child iterator, adds depth, form record opened here)
+        levels = [(iter(self.soup.contents), False, None)]
+        open_forms = []
+        depth = 0
+
+        while levels:
+            node = next(levels[-1][0], None)
+
+            if node is None:
+                _, counted, form = levels.pop()
+                if counted:
+                    depth -= 1
+                if form is not None:
+                    open_forms.pop()
+                continue
+
+            if not hasattr(node, 'children'):
+                self._visit_text(node)
+                continue
+
+            # Skeleton tags add no depth, so every backend measures alike
+            counted = node.name not in self.SKELETON_TAGS
+            form = self._visit_element(node, open_forms, depth + counted)
+
+            if not node.contents:
+                continue
+
+            if counted and depth + 1 >= self.max_depth_cap:
+                self._index_flat(node, open_forms)
+                continue
+
+            levels.append((iter(node.contents), counted, form))
+            if counted:
+                depth += 1
+            if form is not None:
+                open_forms.append(form)
+
+    def _reconcile_forms(self, page_content: str):
+        """
+        Make form results independent of the backend on malformed markup
+
+        lxml and html5lib repair forms the way browsers do: of nested forms
+        lxml gives the fields to the inner one and html5lib to the outer one
+        (dropping the inner action), and html5lib moves the fields of a form
+        placed directly in a <table> out of it. html.parser keeps every form
+        with the fields written inside it, so for such pages the forms are
+        indexed again from an html.parser tree - every form action in the
+        source is then scored, whichever backend is set.
+        """
+        if self.parser != 'html.parser' and _forms_need_repair(page_content, len(self.forms)):
+            self.forms = [
+                {'tag': form,
+                 'has_password': bool(form.find('input', {'type': 'password'})),
+                 'has_email': bool(form.find('input', {'type': 'email'}))}
+                for form in BeautifulSoup(page_content, 'html.parser').find_all('form')
+            ]
+
+    def _index_flat(self, root, open_forms: List[Dict]):
+        """Scan a subtree past the depth cap without tracking nesting"""
+        for node in root.descendants:
+            if not hasattr(node, 'children'):
+                self._visit_text(node)
+                continue
+
+            self.depth_limit_exceeded = True
+            form = self._visit_element(node, open_forms, self.max_depth_cap)
+
+            # Nesting is not tracked here, so the form inspects its own inputs
+            if form is not None:
+                form['has_password'] = bool(node.find('input', {'type': 'password'}))
+                form['has_email'] = bool(node.find('input', {'type': 'email'}))
+
+    def _visit_text(self, node):
+        if type(node) in self.TEXT_TYPES and node.parent.name not in self.NON_VISIBLE_TAGS:
+            text = node.strip()
+            if text:
+                self._text_parts.append(text)
+
+    def _visit_element(self, node, open_forms: List[Dict], depth: int) -> Optional[Dict]:
+        """Index one element; returns its form record if it is a form"""
+        name = node.name
+        if node.get('style') is not None or node.get('hidden') is not None:
+            self.styled_elements.append(node)
+        if name == 'style':
+            self.stylesheets.append(node)
+
+        if name in self.SKELETON_TAGS:
+            return None
+
+        self.element_count += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+        form = None
+        if name == 'form':
+            form = {'tag': node, 'has_password': False, 'has_email': False}
+            self.forms.append(form)
+        elif name == 'input':
+            self.input_count += 1
+            input_type = node.get('type')
+            for record in open_forms:
+                if input_type == 'password':
+                    record['has_password'] = True
+                elif input_type == 'email':
+                    record['has_email'] = True
+        elif name == 'button':
+            self.button_count += 1
+
+        if name in self.RESOURCE_TAGS:
+            self.resources.append(node)
+            if name == 'script':
+                self.scripts.append(node)
+            elif name == 'iframe':
+                self.iframes.append(node)
+
+        return form
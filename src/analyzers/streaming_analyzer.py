@@ -0,0 +1,287 @@
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+from analyzers.style_resolver import StyleResolver, hiding_method
+
+
+class _StreamElement:
+    """Tag name and attributes of an open element, as StyleResolver reads a bs4 Tag"""
+
+    __slots__ = ('name', 'attrs')
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+
+class StreamingPageAnalyzer(HTMLParser):
+    """
+    Incremental DOM + NLP screening over HTML chunks
+    Looks only for critical indicators, so a page can be blocked before
+    the rest of it has arrived. Memory is bounded by the open-element
+    stack, the hidden-text buffer and the stylesheet rules, not by the page
+    size. Hiding is judged on resolved styles: <style> blocks are indexed
+    by a StyleResolver as they arrive and apply to the elements after them.
+    """
+
+    # Hidden-text threats that justify blocking on sight
+    CRITICAL_HIDDEN_THREATS = ('direct_override',)
+
+    # Elements that never have an end tag
+    VOID_ELEMENTS = {
+        'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+        'link', 'meta', 'source', 'track', 'wbr',
+    }
+
+    # Elements that stop the search for an element to close implicitly
+    SCOPE_BOUNDARIES = {
+        'applet', 'button', 'caption', 'html', 'marquee', 'object', 'table', 'td', 'template', 'th',
+    }
+
+    # Start tags that end an open <p>
+    CLOSES_P = {
+        'address', 'article', 'aside', 'blockquote', 'dd', 'details', 'dialog', 'div', 'dl', 'dt',
+        'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+        'header', 'hgroup', 'hr', 'li', 'main', 'menu', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul',
+    }
+
+    # Optional end tags: start tag -> (open elements it ends, elements that stop the search)
+    IMPLIED_END_TAGS = {
+        'li': ({'li'}, SCOPE_BOUNDARIES | {'ol', 'ul', 'menu'}),
+        'dt': ({'dt', 'dd'}, SCOPE_BOUNDARIES | {'dl'}),
+        'dd': ({'dt', 'dd'}, SCOPE_BOUNDARIES | {'dl'}),
+        'option': ({'option'}, {'select', 'datalist', 'optgroup'}),
+        'optgroup': ({'option', 'optgroup'}, {'select'}),
+        'tr': ({'tr', 'td', 'th'}, {'table', 'thead', 'tbody', 'tfoot'}),
+        'td': ({'td', 'th'}, {'tr', 'table'}),
+        'th': ({'td', 'th'}, {'tr', 'table'}),
+        'thead': ({'thead', 'tbody', 'tfoot', 'tr', 'td', 'th'}, {'table'}),
+        'tbody': ({'thead', 'tbody', 'tfoot', 'tr', 'td', 'th'}, {'table'}),
+        'tfoot': ({'thead', 'tbody', 'tfoot', 'tr', 'td', 'th'}, {'table'}),
+        'rt': ({'rt', 'rp'}, {'ruby'}),
+        'rp': ({'rt', 'rp'}, {'ruby'}),
+    }
+
+    def __init__(self, dom_analyzer, nlp_classifier, max_hidden_chars: int = 20000,
+                 max_style_chars: int = 1_000_000):
+        super().__init__(convert_charrefs=True)
+        self.dom_analyzer = dom_analyzer
+        self.nlp_classifier = nlp_classifier
+        self.max_hidden_chars = max_hidden_chars
+        self.max_style_chars = max_style_chars
+        # Text carried over when a long hidden element is classified in parts,
+        # as the normalizer overlaps its chunks
+        self.overlap_chars = nlp_classifier.normalizer.overlap_chars
+
+        self.style_resolver = StyleResolver(max_ancestors=dom_analyzer.max_depth)
+        self._style_text: List[str] = []
+        self._style_chars = 0
+
+        # Open elements: {'tag', 'node', 'hides', 'method', 'form'}
+        self._stack: List[Dict] = []
+        self._hidden_owner: Optional[Dict] = None
+        self._hidden_text: List[str] = []
+        self._hidden_chars = 0
+        self._hidden_tail = ''
+        self._open_forms: List[Dict] = []
+
+        self.chars_fed = 0
+        self.hidden_elements: List[Dict] = []
+        self.suspicious_forms: List[Dict] = []
+        self.nlp_results: Optional[Dict] = None
+        self.critical_indicator: Optional[Dict] = None
+
+    def feed(self, chunk: str) -> Optional[Dict]:
+        """Feed the next chunk; returns the critical indicator once one is found"""
+        if self.critical_indicator is None:
+            self.chars_fed += len(chunk)
+            super().feed(chunk)
+        return self.critical_indicator
+
+    def close(self) -> Optional[Dict]:
+        """Flush buffered input; returns the critical indicator, if any"""
+        if self.critical_indicator is None:
+            super().close()
+            if self._hidden_owner is not None:
+                self._flush_hidden_text()
+        return self.critical_indicator
+
+    def handle_starttag(self, tag, attrs):
+        attributes = {name: value or '' for name, value in attrs}
+        if 'class' in attributes:
+            attributes['class'] = attributes['class'].split()
+
+        self._close_implied(tag)
+        self._end_text_node()
+
+        node = _StreamElement(tag, attributes)
+        element = {'tag': tag, 'node': node, 'hides': False, 'form': None}
+
+        if self._hidden_owner is None and (self.style_resolver.has_rules or 'style' in attributes
+                                           or 'hidden' in attributes):
+            ancestors = [open_element['node'] for open_element in self._stack]
+            method = hiding_method(self.style_resolver.resolve(node, ancestors))
+            if method:
+                element['hides'] = True
+                element['method'] = method
+                element['path'] = self.dom_analyzer._element_path(ancestors, node)
+                self._hidden_owner = element
+
+        if tag == 'form':
+            action = attributes.get('action', '')
+            element['form'] = {
+                'action': action,
+                'method': attributes.get('method', 'get').lower(),
+                'is_external': self.dom_analyzer._is_external_url(action),
+                'flagged': False,
+            }
+            self._open_forms.append(element['form'])
+        elif tag == 'input' and attributes.get('type') == 'password':
+            for form in self._open_forms:
+                # Reported once, however many password fields it has
+                if form['is_external'] and not form['flagged']:
+                    self._flag_external_password_form(form)
+
+        if tag not in self.VOID_ELEMENTS:
+            self._stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in self.VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._end_text_node()
+        if tag == 'style' and self._style_text:
+            self.style_resolver.add_stylesheet(''.join(self._style_text))
+            self._style_text = []
+            self._style_chars = 0
+
+        # Tolerate mis-nesting: close back to the matching open element, if any
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index]['tag'] == tag:
+                self._pop_to(index)
+                return
+
+    def _close_implied(self, tag: str):
+        """Close elements whose end tag may be left out (<li>, <p>, <td>, ...) as tag implies"""
+        rules = []
+        if tag in self.CLOSES_P:
+            rules.append(({'p'}, self.SCOPE_BOUNDARIES))
+        if tag in self.IMPLIED_END_TAGS:
+            rules.append(self.IMPLIED_END_TAGS[tag])
+
+        for closes, boundaries in rules:
+            for index in range(len(self._stack) - 1, -1, -1):
+                open_tag = self._stack[index]['tag']
+                if open_tag in closes:
+                    self._pop_to(index)
+                    break
+                if open_tag in boundaries:
+                    break
+
+    def _pop_to(self, index: int):
+        """Close the open elements from the top of the stack down to index"""
+        while len(self._stack) > index:
+            element = self._stack.pop()
+            if element['form'] is not None:
+                self._open_forms.remove(element['form'])
+            if element is self._hidden_owner:
+                self._flush_hidden_text()
+
+    def handle_data(self, data):
+        if self.cdata_elem == 'style':
+            # Bounded: an oversized stylesheet is indexed up to max_style_chars
+            if self._style_chars < self.max_style_chars:
+                self._style_text.append(data)
+                self._style_chars += len(data)
+            return
+
+        if self._hidden_owner is None or self.cdata_elem is not None:
+            return
+
+        # A text node may arrive in several pieces - they are joined as they are
+        self._hidden_text.append(data)
+        self._hidden_chars += len(data)
+        if self._hidden_chars >= self.max_hidden_chars:
+            # Classify what we have so far instead of buffering without bound
+            self._flush_hidden_text(keep_open=True)
+
+    def _end_text_node(self):
+        # Text nodes are kept apart by a space, as DOMAnalyzer joins them
+        if self._hidden_owner is not None and self._hidden_text and self._hidden_text[-1] != ' ':
+            self._hidden_text.append(' ')
+
+    def _flush_hidden_text(self, keep_open: bool = False):
+        """Classify the text collected under the current hidden element"""
+        owner = self._hidden_owner
+        raw = ''.join(self._hidden_text)
+        text = ' '.join(raw.split())
+
+        # The end of a part is classified again with the next one, so a
+        # phrase cut at the part boundary (even mid-word) is still seen whole
+        scanned = ' '.join((self._hidden_tail + raw).split())
+        self._hidden_tail = raw[-self.overlap_chars:] if keep_open and self.overlap_chars else ''
+
+        self._hidden_text = []
+        self._hidden_chars = 0
+        if not keep_open:
+            self._hidden_owner = None
+
+        if not text:
+            return
+
+        method = owner['method']
+        self.hidden_elements.append({
+            'tag': owner['tag'],
+            'text': text,
+            'method': method,
+            'severity': self.dom_analyzer._calculate_hiding_severity(method, text),
+            'path': owner['path']
+        })
+
+        nlp = self.nlp_classifier.classify_text(scanned, context='hidden')
+        critical = [t for t in nlp['threats'] if t in self.CRITICAL_HIDDEN_THREATS]
+        if critical and self.critical_indicator is None:
+            self.nlp_results = nlp
+            self.critical_indicator = {
+                'type': 'hidden_' + critical[0],
+                'reason': f"Hidden {owner['tag']} element contains {critical[0].replace('_', ' ')} text",
+                'offset': self.chars_fed,
+            }
+
+    def _flag_external_password_form(self, form: Dict):
+        form['flagged'] = True
+        self.suspicious_forms.append({
+            'action': form['action'],
+            'method': form['method'],
+            'has_password': True,
+            'has_email': False,
+            'is_external': True,
+            'risk_score': 0.6,
+            'indicators': ['external_password_submission']
+        })
+
+        if self.critical_indicator is None:
+            self.critical_indicator = {
+                'type': 'external_password_submission',
+                'reason': f"Password form submits to external URL {form['action']}",
+                'offset': self.chars_fed,
+            }
+
+    def get_dom_results(self) -> Dict:
+        """Partial DOM results in the same shape as DOMAnalyzer.analyze"""
+        return {
+            'hidden_elements': list(self.hidden_elements),
+            'suspicious_forms': list(self.suspicious_forms),
+            'external_resources': [],
+            'iframe_analysis': [],
+            'script_analysis': {},
+            'dom_complexity': {},
+        }
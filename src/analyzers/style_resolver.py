@@ -0,0 +1,406 @@
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Properties that can hide an element's text; everything else is dropped
+# while parsing, so the rule index only holds rules that matter
+HIDING_PROPERTIES = frozenset({
+    'display', 'visibility', 'opacity', 'font-size', 'position',
+    'left', 'top', 'text-indent',
+})
+
+# Moved this far off the page, text is out of sight
+OFFSCREEN_PX = -999
+
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_WHITESPACE = re.compile(r'\s+')
+_LENGTH = re.compile(r'^(-?(?:\d+\.?\d*|\.\d+))([a-z%]*)$')
+_COMPOUND = re.compile(
+    r'(?P<tag>[a-zA-Z][\w-]*|\*)?'
+    r'(?P<rest>(?:#[\w-]+|\.[\w-]+|\[[^\]]+\])*)$'
+)
+_SIMPLE = re.compile(r'#([\w-]+)|\.([\w-]+)|\[\s*([\w-]+)\s*(?:([~^$*|]?=)\s*["\']?([^"\'\]]*)["\']?\s*)?\]')
+
+_AT_KEYWORD = re.compile(r'@[\w-]*')
+_AT_STATEMENT = re.compile(r'@[\w-]+[^;{}]*;')
+_MEDIA_WIDTH = re.compile(r'\((min|max)-width\s*:\s*([\d.]+)px\s*\)')
+
+# Conditional group rules whose contents apply when the condition holds
+_CONDITIONAL_AT_RULES = ('@media', '@supports', '@layer', '@container')
+
+# Media queries are evaluated for the agent's browser window
+VIEWPORT_WIDTH_PX = 1280
+
+
+def parse_declarations(text: str) -> Dict[str, Tuple[str, bool]]:
+    """
+    'display: none !important; color:red' -> {'display': ('none', True)}
+    Only hiding properties are kept; values are lowercased with whitespace collapsed
+    """
+    declarations = {}
+    for declaration in text.split(';'):
+        name, colon, value = declaration.partition(':')
+        if not colon:
+            continue
+        name = name.strip().lower()
+        if name not in HIDING_PROPERTIES:
+            continue
+
+        value = _WHITESPACE.sub(' ', value.strip().lower())
+        important = value.endswith('!important')
+        if important:
+            value = value[:-len('!important')].rstrip()
+        declarations[name] = (value, important)
+    return declarations
+
+
+def _length_px(value: str) -> Optional[float]:
+    """A CSS length in px (em/rem as 16px), None if it is not a plain length"""
+    match = _LENGTH.match(value)
+    if not match:
+        return None
+    number, unit = float(match.group(1)), match.group(2)
+    if unit in ('', 'px'):
+        return number
+    if unit in ('em', 'rem'):
+        return number * 16
+    if unit == 'pt':
+        return number * 4 / 3
+    # Percentages, vw, ... - only zero is certain
+    return number if number == 0 else None
+
+
+def _media_applies(query: str) -> bool:
+    """Would a headless screen browser VIEWPORT_WIDTH_PX wide apply this media query?"""
+    for alternative in query.lower().split(','):
+        if 'print' in alternative or 'speech' in alternative:
+            continue
+        if all(
+            (VIEWPORT_WIDTH_PX >= float(width)) if bound == 'min' else (VIEWPORT_WIDTH_PX <= float(width))
+            for bound, width in _MEDIA_WIDTH.findall(alternative)
+        ):
+            return True
+    return False
+
+
+def hiding_method(values: Dict[str, str]) -> Optional[str]:
+    """How (if at all) these resolved property values hide the element"""
+    if values.get('display') == 'none':
+        return 'display_none'
+    if values.get('visibility') in ('hidden', 'collapse'):
+        return 'visibility_hidden'
+
+    opacity = values.get('opacity')
+    if opacity is not None:
+        try:
+            if float(opacity.rstrip('%')) == 0:
+                return 'opacity_zero'
+        except ValueError:
+            pass
+
+    font_size = values.get('font-size')
+    if font_size is not None:
+        size = _length_px(font_size)
+        if size is not None and size <= 1:
+            return 'tiny_font'
+
+    indent = _length_px(values.get('text-indent', ''))
+    if indent is not None and indent <= OFFSCREEN_PX:
+        return 'offscreen_positioning'
+
+    # Positioning alone hides nothing - only a large negative offset does
+    if values.get('position') in ('absolute', 'fixed'):
+        for side in ('left', 'top'):
+            offset = _length_px(values.get(side, ''))
+            if offset is not None and offset <= OFFSCREEN_PX:
+                return 'offscreen_positioning'
+
+    return None
+
+
+class _Compound:
+    """One compound selector, e.g. div.notice[hidden]"""
+
+    __slots__ = ('tag', 'ids', 'classes', 'attributes')
+
+    def __init__(self, tag: Optional[str], ids: List[str], classes: List[str], attributes: List[Tuple]):
+        self.tag = tag
+        self.ids = ids
+        self.classes = classes
+        self.attributes = attributes
+
+    def matches(self, element) -> bool:
+        if self.tag is not None and element.name != self.tag:
+            return False
+
+        if self.ids and any(element.get('id') != id_ for id_ in self.ids):
+            return False
+
+        if self.classes:
+            element_classes = element.get('class') or ()
+            if any(name not in element_classes for name in self.classes):
+                return False
+
+        for name, operator, expected in self.attributes:
+            value = element.get(name)
+            if value is None:
+                return False
+            if isinstance(value, list):
+                value = ' '.join(value)
+            if operator is None:
+                continue
+            if operator == '=' and value != expected:
+                return False
+            if operator == '~=' and expected not in value.split():
+                return False
+            if operator == '^=' and not value.startswith(expected):
+                return False
+            if operator == '$=' and not value.endswith(expected):
+                return False
+            if operator == '*=' and expected not in value:
+                return False
+            if operator == '|=' and value != expected and not value.startswith(expected + '-'):
+                return False
+        return True
+
+
+class _Rule:
+    __slots__ = ('compounds', 'combinators', 'specificity', 'order', 'declarations')
+
+    def __init__(self, compounds, combinators, specificity, order, declarations):
+        # Right to left: compounds[0] is the subject, combinators[i] joins
+        # compounds[i] to compounds[i + 1]
+        self.compounds = compounds
+        self.combinators = combinators
+        self.specificity = specificity
+        self.order = order
+        self.declarations = declarations
+
+    def matches(self, element, ancestors: Sequence, floor: int = 0) -> bool:
+        """ancestors: root first, parent last; those below index floor are not looked at"""
+        if not self.compounds[0].matches(element):
+            return False
+        return self._match_ancestors(1, len(ancestors) - 1, ancestors, floor, set())
+
+    def _match_ancestors(self, index: int, position: int, ancestors: Sequence, floor: int, failed: set) -> bool:
+        """
+        Match compounds[index:] against ancestors[floor:position + 1]
+
+        failed remembers (index, position) pairs already known not to match,
+        so a long descendant selector on a deep page is tried at each pair
+        once instead of backtracking through every combination.
+        """
+        if index == len(self.compounds):
+            return True
+        if (index, position) in failed:
+            return False
+
+        compound = self.compounds[index]
+        if self.combinators[index - 1] == '>':
+            if position >= floor and compound.matches(ancestors[position]) \
+                    and self._match_ancestors(index + 1, position - 1, ancestors, floor, failed):
+                return True
+            failed.add((index, position))
+            return False
+
+        start = position
+        while position >= floor:
+            if compound.matches(ancestors[position]) \
+                    and self._match_ancestors(index + 1, position - 1, ancestors, floor, failed):
+                return True
+            position -= 1
+        failed.add((index, start))
+        return False
+
+
+class StyleResolver:
+    """
+    Effective hiding styles from <style> blocks plus inline styles
+
+    Stylesheet rules are parsed once per page, keeping only those that set
+    a hiding property, and indexed by the id, class or tag of their
+    rightmost compound selector - so an element is only tested against the
+    rules that could apply to it. Supports type, #id, .class and [attribute]
+    selectors with descendant and child combinators; rules using other
+    combinators or pseudo-classes are ignored. Values cascade by
+    !important, inline vs stylesheet, specificity and source order.
+    """
+
+    def __init__(self, stylesheets: Iterable[str] = (), max_ancestors: int = 256):
+        # Descendant selectors look at most this far up (bounds deep pages)
+        self.max_ancestors = max_ancestors
+        self.by_id: Dict[str, List[_Rule]] = {}
+        self.by_class: Dict[str, List[_Rule]] = {}
+        self.by_tag: Dict[str, List[_Rule]] = {}
+        self.universal: List[_Rule] = []
+        self.rule_count = 0
+
+        for css in stylesheets:
+            self.add_stylesheet(css)
+
+    def add_stylesheet(self, css: str):
+        """Index the hiding rules of one stylesheet (later sheets win ties)"""
+        css = _AT_STATEMENT.sub('', _COMMENT.sub('', css))
+        selector_start = 0
+        position = 0
+
+        # Flat scan: the wrapper of an applicable @media (or @supports, ...)
+        # block is stepped over so its rules are read like top-level ones;
+        # other at-rule blocks are skipped whole
+        while position < len(css):
+            brace = css.find('{', position)
+            if brace == -1:
+                return
+            closing = css.find('}', position)
+            if closing != -1 and closing < brace:
+                # End of an @media block
+                position = selector_start = closing + 1
+                continue
+
+            prelude = css[selector_start:brace].strip()
+            if prelude.startswith('@'):
+                keyword = _AT_KEYWORD.match(prelude).group(0).lower()
+                if keyword in _CONDITIONAL_AT_RULES and (keyword != '@media' or _media_applies(prelude[6:])):
+                    position = selector_start = brace + 1
+                else:
+                    position = selector_start = self._skip_block(css, brace) + 1
+                continue
+
+            end = css.find('}', brace)
+            if end == -1:
+                end = len(css)
+            declarations = parse_declarations(css[brace + 1:end])
+            if declarations:
+                for selector in prelude.split(','):
+                    self._add_rule(selector.strip(), declarations)
+            position = selector_start = end + 1
+
+    @staticmethod
+    def _skip_block(css: str, brace: int) -> int:
+        depth = 0
+        for index in range(brace, len(css)):
+            if css[index] == '{':
+                depth += 1
+            elif css[index] == '}':
+                depth -= 1
+                if depth == 0:
+                    return index
+        return len(css)
+
+    def _add_rule(self, selector: str, declarations: Dict):
+        if not selector or ':' in selector or '+' in selector or '~' in selector.replace('~=', ''):
+            return
+
+        compounds, combinators = [], []
+        specificity = [0, 0, 0]
+        pending = None
+
+        for token in reversed(selector.replace('>', ' > ').split()):
+            if token == '>':
+                if not compounds or pending is not None:
+                    return
+                pending = '>'
+                continue
+
+            compound = self._parse_compound(token, specificity)
+            if compound is None:
+                return
+            if compounds:
+                combinators.append(pending or ' ')
+            compounds.append(compound)
+            pending = None
+
+        if not compounds or pending is not None:
+            return
+
+        rule = _Rule(compounds, combinators, tuple(specificity), self.rule_count, declarations)
+        self.rule_count += 1
+
+        subject = compounds[0]
+        if subject.ids:
+            self.by_id.setdefault(subject.ids[0], []).append(rule)
+        elif subject.classes:
+            self.by_class.setdefault(subject.classes[0], []).append(rule)
+        elif subject.tag is not None:
+            self.by_tag.setdefault(subject.tag, []).append(rule)
+        else:
+            self.universal.append(rule)
+
+    @staticmethod
+    def _parse_compound(token: str, specificity: List[int]) -> Optional[_Compound]:
+        match = _COMPOUND.match(token)
+        if not match:
+            return None
+
+        tag = match.group('tag')
+        ids, classes, attributes = [], [], []
+        rest = match.group('rest')
+        parsed = 0
+        for simple in _SIMPLE.finditer(rest):
+            parsed += len(simple.group(0))
+            id_, class_, attribute, operator, value = simple.groups()
+            if id_:
+                ids.append(id_)
+            elif class_:
+                classes.append(class_)
+            else:
+                attributes.append((attribute.lower(), operator, value))
+        if parsed != len(rest):
+            # Something the simple-selector grammar above does not cover
+            return None
+
+        specificity[0] += len(ids)
+        specificity[1] += len(classes) + len(attributes)
+        if tag not in (None, '*'):
+            specificity[2] += 1
+
+        return _Compound(None if tag in (None, '*') else tag.lower(), ids, classes, attributes)
+
+    @property
+    def has_rules(self) -> bool:
+        return self.rule_count > 0
+
+    def candidate_rules(self, element) -> List[_Rule]:
+        rules = list(self.universal)
+        rules.extend(self.by_tag.get(element.name, ()))
+
+        element_id = element.get('id')
+        if element_id:
+            rules.extend(self.by_id.get(element_id, ()))
+
+        for name in element.get('class') or ():
+            rules.extend(self.by_class.get(name, ()))
+        return rules
+
+    def resolve(self, element, ancestors: Sequence) -> Dict[str, str]:
+        """Cascaded value of each hiding property set on element (ancestors: root first)"""
+        # property -> (important, inline, specificity, order, value)
+        winners: Dict[str, Tuple] = {}
+
+        if self.has_rules:
+            floor = max(0, len(ancestors) - self.max_ancestors)
+            for rule in self.candidate_rules(element):
+                if not rule.matches(element, ancestors, floor):
+                    continue
+                for name, (value, important) in rule.declarations.items():
+                    key = (important, False, rule.specificity, rule.order, value)
+                    if name not in winners or key[:4] > winners[name][:4]:
+                        winners[name] = key
+
+        inline = element.get('style')
+        if inline:
+            for name, (value, important) in parse_declarations(inline).items():
+                key = (important, True, (0, 0, 0), 0, value)
+                if name not in winners or key[:4] > winners[name][:4]:
+                    winners[name] = key
+
+        values = {name: key[4] for name, key in winners.items()}
+
+        # The hidden attribute is a user-agent display:none - any author rule wins over it
+        if 'display' not in values and element.get('hidden') is not None:
+            values['display'] = 'none'
+        return values
+
+
+def inline_values(style: str) -> Dict[str, str]:
+    """Hiding property values of an inline style attribute alone"""
+    return {name: value for name, (value, _) in parse_declarations(style).items()}
@@ -0,0 +1,125 @@
+import re
+import unicodedata
+from typing import Dict, Iterator, Tuple
+
+# Invisible format characters used to split keywords ("ig​nore"):
+# soft hyphen, zero-width space/joiners, direction marks and overrides,
+# word joiner and invisible operators, variation selectors, BOM, tags
+_INVISIBLE_RANGES = (
+    (0x00AD, 0x00AD), (0x034F, 0x034F), (0x061C, 0x061C), (0x115F, 0x1160),
+    (0x17B4, 0x17B5), (0x180B, 0x180F), (0x200B, 0x200F), (0x202A, 0x202E),
+    (0x2060, 0x206F), (0x3164, 0x3164), (0xFE00, 0xFE0F), (0xFEFF, 0xFEFF),
+    (0xFFA0, 0xFFA0), (0x1D173, 0x1D17A), (0xE0000, 0xE007F),
+)
+
+# Cyrillic and Greek letters that render like Latin ones (NFKC keeps them)
+_HOMOGLYPHS = {
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'е': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o', 'р': 'p',
+    'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'і': 'i', 'ј': 'j', 'ѕ': 's', 'ԁ': 'd',
+    'һ': 'h', 'ԛ': 'q', 'ԝ': 'w', 'ӏ': 'l',
+    'А': 'A', 'В': 'B', 'Е': 'E', 'К': 'K', 'М': 'M', 'Н': 'H', 'О': 'O', 'Р': 'P',
+    'С': 'C', 'Т': 'T', 'У': 'Y', 'Х': 'X', 'І': 'I', 'Ј': 'J', 'Ѕ': 'S', 'Ԁ': 'D',
+    # Greek
+    'α': 'a', 'ε': 'e', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p', 'τ': 't',
+    'υ': 'u', 'χ': 'x',
+    'Α': 'A', 'Β': 'B', 'Ε': 'E', 'Ζ': 'Z', 'Η': 'H', 'Ι': 'I', 'Κ': 'K', 'Μ': 'M',
+    'Ν': 'N', 'Ο': 'O', 'Ρ': 'P', 'Τ': 'T', 'Υ': 'Y', 'Χ': 'X',
+}
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Whitespace followed by an ASCII letter or digit: nothing on either side
+# combines, folds or collapses across it, so text split there normalizes
+# piece by piece exactly as it would whole
+_CUT_POINT = re.compile(r'\s(?=[0-9A-Za-z])')
+
+
+def _build_fold_table() -> Dict[int, object]:
+    table: Dict[int, object] = {}
+    for first, last in _INVISIBLE_RANGES:
+        for codepoint in range(first, last + 1):
+            table[codepoint] = None
+    for char, replacement in _HOMOGLYPHS.items():
+        table[ord(char)] = replacement
+    return table
+
+
+class TextNormalizer:
+    """
+    Canonical form of page text for the NLP patterns, in bounded pieces
+
+    Invisible format characters are dropped, the text is NFKC-normalized
+    (full-width and stylized letters become ASCII), Latin-looking Cyrillic
+    and Greek letters are folded to Latin, and whitespace runs become one
+    space. Long text is processed in chunks of about chunk_chars, cut at
+    whitespace and padded with overlap_chars of their neighbours so a
+    match across a boundary is still seen; at most max_chars of input are
+    read.
+    """
+
+    FOLD_TABLE = _build_fold_table()
+
+    def __init__(self, max_chars: int = 1_000_000, chunk_chars: int = 65536, overlap_chars: int = 512):
+        if overlap_chars >= chunk_chars:
+            raise ValueError("overlap_chars must be smaller than chunk_chars")
+        self.max_chars = max_chars
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'TextNormalizer':
+        """Build from the nlp_normalization block of config.yaml"""
+        settings = config.get('nlp_normalization') or {}
+        return cls(
+            max_chars=settings.get('max_chars', 1_000_000),
+            chunk_chars=settings.get('chunk_chars', 65536),
+            overlap_chars=settings.get('overlap_chars', 512)
+        )
+
+    def normalize(self, text: str) -> str:
+        # ASCII text is already NFKC-stable and has nothing to fold
+        if not text.isascii():
+            # Folded again after NFKC: styled letters (e.g. mathematical Greek) decompose to look-alikes
+            text = unicodedata.normalize('NFKC', text.translate(self.FOLD_TABLE)).translate(self.FOLD_TABLE)
+        return _WHITESPACE.sub(' ', text)
+
+    def chunks(self, text: str) -> Iterator[Tuple[str, int, int]]:
+        """
+        Yield (normalized chunk, start, end)
+
+        chunk[start:end] is this chunk's own share of the text; it is padded
+        with up to overlap_chars of the previous and next shares, so a match
+        that starts inside the share but runs past it is still complete
+        (up to overlap_chars long). Shares end at cut points, so together
+        they are exactly normalize(text[:max_chars]) unless a piece held no
+        whitespace to cut at.
+        """
+        overlap = self.overlap_chars
+        pieces = self._pieces(text, min(len(text), self.max_chars))
+
+        before = ''
+        current = next(pieces, None)
+        while current is not None:
+            following = next(pieces, None)
+            after = following[:overlap] if following else ''
+            yield before + current + after, len(before), len(before) + len(current)
+            before = (before + current)[-overlap:] if overlap else ''
+            current = following
+
+    def _pieces(self, text: str, limit: int) -> Iterator[str]:
+        """Normalized text[:limit], each piece cut at the last cut point within chunk_chars"""
+        start = 0
+        while start < limit:
+            end = start + self.chunk_chars
+            if end < limit:
+                # No cut point (one huge word) - cut at chunk_chars anyway
+                for cut in _CUT_POINT.finditer(text, start, end + 1):
+                    end = cut.end()
+            else:
+                end = limit
+            yield self.normalize(text[start:end])
+            start = end
+
+    def is_truncated(self, text: str) -> bool:
+        return len(text) > self.max_chars
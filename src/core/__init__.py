@@ -4,8 +4,10 @@ Core components: Agent and Security Mediator
 
 from .agent import AgenticBrowser
 from .security_mediator import SecurityMediator
+from .screening_service import ScreeningService
 
 __all__ = [
     'AgenticBrowser',
-    'SecurityMediator'
+    'SecurityMediator',
+    'ScreeningService'
 ]
\ No newline at end of file
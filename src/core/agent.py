@@ -1,10 +1,11 @@
 from playwright.sync_api import sync_playwright, Page
 from typing import Dict, List, Optional
-import json
 import os
 
 import google.generativeai as genai
 from dotenv import load_dotenv
+from utils.response_parser import AGENT_ACTION_SCHEMA, parse_response, parse_stream
+from core.browser_scripts import WATCH_MUTATIONS_JS, DRAIN_MUTATIONS_JS, EXTRACT_FEATURES_JS
 
 
 class AgenticBrowser:
@@ -26,10 +27,27 @@ class AgenticBrowser:
         # Keep same variable name + intent
         self.model = "gemini-2.5-flash-lite"
 
+        # Act on the plan as soon as action_type and selector have streamed in
+        self.stream_responses = config.get('llm_streaming', True)
+
+        # html: send page.content() to the security layer; browser: extract
+        # the DOM features in Chromium and send only those
+        extraction_config = config.get('dom_extraction') or {}
+        self.dom_extraction = extraction_config.get('mode', 'html')
+        self.max_text_chars = extraction_config.get('max_text_chars', 200000)
+
+        # After an action, re-screen only what changed on the page
+        rescreen_config = config.get('mutation_rescreen') or {}
+        self.mutation_rescreen = rescreen_config.get('enabled', True)
+        self.max_mutation_bytes = rescreen_config.get('max_fragment_bytes', 256 * 1024)
+
         self.browser = None
         self.page = None
         self.current_goal = ""
 
+        # Latest security assessment of the current page
+        self.risk_state: Optional[Dict] = None
+
     def launch(self, headless: bool = True):
         """Launch the browser (safe for repeated calls)"""
         if getattr(self, "_playwright", None) is None:
@@ -61,16 +79,15 @@ class AgenticBrowser:
             self.page.goto(url, wait_until='networkidle')
 
 
-        page_content = self.page.content()
-
         print("🔒 Running security analysis...")
-        security_assessment = self.security_mediator.analyze_page(
-            page_content=page_content,
-            agent_goal=goal
-        )
+        page_content, security_assessment = self._analyze_current_page()
 
         print(f"\n{security_assessment['explanation']}\n")
 
+        self.risk_state = security_assessment
+        if self.mutation_rescreen:
+            self.page.evaluate(WATCH_MUTATIONS_JS)
+
         action = security_assessment["action"]
 
         if action == "BLOCK":
@@ -96,6 +113,14 @@ class AgenticBrowser:
 
         try:
             result = self._execute_task(goal, page_content, security_assessment)
+            if result.get("action") == "BLOCKED_AFTER_ACTION":
+                return {
+                    "status": "BLOCKED",
+                    "reason": "Page turned malicious after the agent's action",
+                    "result": result,
+                    "security_assessment": result["security_assessment"],
+                    "task_completed": False
+                }
             return {
                 "status": "SUCCESS",
                 "result": result,
@@ -136,25 +161,14 @@ class AgenticBrowser:
         If the goal is already complete or cannot be completed, use "none".
         """
 
-        response = self.anthropic.generate_content(prompt)
-
-        # ✅ SAFE text extraction for Gemini
-        response_text = ""
-        if hasattr(response, "text") and response.text:
-            response_text = response.text
-        elif hasattr(response, "candidates") and response.candidates:
-            response_text = response.candidates[0].content.parts[0].text
-        else:
-            raise ValueError("Gemini returned empty response")
-
-
-        # Parse JSON response (UNCHANGED)
-        if "```json" in response_text:
-            json_str = response_text.split("```json")[1].split("```")[0].strip()
+        if self.stream_responses:
+            chunks = self.anthropic.generate_content(prompt, stream=True)
+            action_plan = parse_stream((self._response_text(chunk) for chunk in chunks), AGENT_ACTION_SCHEMA)
         else:
-            json_str = response_text.strip()
-
-        action_plan = json.loads(json_str)
+            response_text = self._response_text(self.anthropic.generate_content(prompt))
+            if not response_text:
+                raise ValueError("Gemini returned empty response")
+            action_plan = parse_response(response_text, AGENT_ACTION_SCHEMA)
 
         action_validation = self.security_mediator.validate_action(
             action=str(action_plan),
@@ -170,7 +184,77 @@ class AgenticBrowser:
                 "reason": f"Action validation failed: {action_validation.get('concerns')}"
             }
 
-        return self._perform_action(action_plan)
+        result = self._perform_action(action_plan)
+
+        if self.mutation_rescreen and result.get("status") == "success" \
+                and result.get("action") in ("click", "fill", "submit"):
+            assessment = self._rescreen_changes()
+            if assessment["action"] == "BLOCK":
+                # Same as a BLOCK from analyze_page: nothing more is done on this page
+                print("🚫 Page turned malicious after the action - stopping here")
+                return {
+                    "action": "BLOCKED_AFTER_ACTION",
+                    "reason": "Re-screen after the action blocked the page",
+                    "performed": result,
+                    "security_assessment": assessment
+                }
+            result["security_assessment"] = assessment
+
+        return result
+
+    def _analyze_current_page(self):
+        """Full security analysis of the current page; returns (page content, assessment)"""
+        if self.dom_extraction == 'browser':
+            features = self.page.evaluate(EXTRACT_FEATURES_JS, {
+                'dangerousPatterns': self.security_mediator.dom_analyzer.DANGEROUS_SCRIPT_PATTERNS,
+                'maxTextChars': self.max_text_chars,
+            })
+            return features['visible_text'], self.security_mediator.analyze_features(
+                features=features,
+                agent_goal=self.current_goal
+            )
+
+        page_content = self.page.content()
+        return page_content, self.security_mediator.analyze_page(
+            page_content=page_content,
+            agent_goal=self.current_goal
+        )
+
+    def _rescreen_changes(self) -> Dict:
+        """
+        Re-screen the page after an action: only the subtrees that changed go
+        through the security layers, merged into the current risk state.
+        A navigation (or a change too large to send piecemeal) falls back to
+        a full analyze_page.
+        """
+        try:
+            fragments = self.page.evaluate(DRAIN_MUTATIONS_JS, self.max_mutation_bytes)
+        except Exception:
+            # The action navigated away while we were asking
+            fragments = None
+
+        if fragments == []:
+            return self.risk_state
+
+        if fragments is None:
+            self.page.wait_for_load_state()
+            _, assessment = self._analyze_current_page()
+            self.page.evaluate(WATCH_MUTATIONS_JS)
+        else:
+            assessment = self.security_mediator.analyze_mutations(
+                fragments, self.current_goal, self.risk_state
+            )
+
+        self.risk_state = assessment
+        return assessment
+
+    def _response_text(self, response) -> str:
+        """✅ SAFE text extraction for Gemini (a whole response or one streamed chunk)"""
+        if hasattr(response, "text") and response.text:
+            return response.text
+        if hasattr(response, "candidates") and response.candidates:
+            return response.candidates[0].content.parts[0].text
+        return ""
 
     def _perform_action(self, action_plan: Dict) -> Dict:
         """Actually perform the browser action"""
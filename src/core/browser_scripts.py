@@ -0,0 +1,228 @@
+"""
+JavaScript the AgenticBrowser injects with page.evaluate
+"""
+
+# Computed-style hiding test shared by the scripts below - the rules of
+# style_resolver.hiding_method, in the same order and with the same
+# OFFSCREEN_PX. The one difference is the input: the browser hands over
+# computed values, so em/rem/% lengths are resolved against the real font
+# size and containing block (hiding_method assumes 16px and gives up on %),
+# and visibility is inherited by descendants.
+_HIDING_METHOD_JS = """
+    const OFFSCREEN_PX = -999;
+    const hidingMethod = (element) => {
+        const style = getComputedStyle(element);
+        if (style.display === 'none') return 'display_none';
+        if (style.visibility === 'hidden' || style.visibility === 'collapse') return 'visibility_hidden';
+        if (parseFloat(style.opacity) === 0) return 'opacity_zero';
+        if (parseFloat(style.fontSize) <= 1) return 'tiny_font';
+        if (parseFloat(style.textIndent) <= OFFSCREEN_PX) return 'offscreen_positioning';
+        // Positioning alone hides nothing - only a large negative offset does
+        if (style.position === 'absolute' || style.position === 'fixed') {
+            if (parseFloat(style.left) <= OFFSCREEN_PX || parseFloat(style.top) <= OFFSCREEN_PX) {
+                return 'offscreen_positioning';
+            }
+        }
+        return null;
+    };
+"""
+
+# Starts (or restarts) recording DOM mutations on the current document
+WATCH_MUTATIONS_JS = """
+() => {
+    if (window.__sabObserver) {
+        window.__sabObserver.takeRecords();
+        window.__sabMutations = [];
+        return;
+    }
+    window.__sabMutations = [];
+    window.__sabObserver = new MutationObserver(records => {
+        window.__sabMutations.push(...records);
+    });
+    window.__sabObserver.observe(document.documentElement, {
+        childList: true, subtree: true, attributes: true, characterData: true
+    });
+}
+"""
+
+# Returns the outerHTML of every added or changed subtree since the last
+# call (nested ones folded into their outermost changed ancestor) and
+# resets the record. Returns null when there is no observer (a new
+# document), when the change is too big to be worth sending piecemeal, or
+# when a changed subtree holds hidden content or sits inside a hidden
+# element - a fragment parsed without its ancestors and the page's
+# stylesheets cannot tell. The caller then re-screens the whole page.
+DRAIN_MUTATIONS_JS = """
+(maxBytes) => {""" + _HIDING_METHOD_JS + """
+    // Hidden by the user agent anyway - not a hiding trick
+    const NOT_RENDERED = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'HEAD', 'TITLE', 'META', 'LINK']);
+    const hides = (element) => !NOT_RENDERED.has(element.tagName)
+        && !(element.tagName === 'INPUT' && element.type === 'hidden')
+        && hidingMethod(element) !== null;
+
+    // Is the subtree, or part of it, hidden by computed style (page stylesheets included)?
+    const hiddenInPage = (element) => {
+        for (let node = element; node; node = node.parentElement) {
+            if (hides(node)) return true;
+        }
+        for (const descendant of element.querySelectorAll('*')) {
+            if (hides(descendant)) return true;
+        }
+        return false;
+    };
+
+    const observer = window.__sabObserver;
+    if (!observer) return null;
+
+    const records = window.__sabMutations.concat(observer.takeRecords());
+    window.__sabMutations = [];
+
+    const changed = new Set();
+    for (const record of records) {
+        if (record.type === 'childList') {
+            for (const node of record.addedNodes) {
+                changed.add(node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement);
+            }
+        } else if (record.type === 'attributes') {
+            changed.add(record.target);
+        } else {
+            changed.add(record.target.parentElement);
+        }
+    }
+
+    const fragments = [];
+    let total = 0;
+    for (const node of changed) {
+        if (!node || !node.isConnected) continue;
+        if (node === document.documentElement || node === document.body) return null;
+
+        let ancestor = node.parentElement;
+        while (ancestor && !changed.has(ancestor)) ancestor = ancestor.parentElement;
+        if (ancestor) continue;
+
+        const html = node.outerHTML;
+        total += html.length;
+        if (total > maxBytes || hiddenInPage(node)) return null;
+        fragments.push(html);
+    }
+    return fragments;
+}
+"""
+
+# One pass over the live DOM, returning what DOMAnalyzer.analyze_features
+# scores: hidden-text elements with their computed hiding method (their
+# subtrees are not descended into again), forms, external resources,
+# iframes, scripts with inline-risk markers, complexity counts and the
+# rendered text. options: {dangerousPatterns, maxTextChars}
+EXTRACT_FEATURES_JS = """
+(options) => {
+    const SKELETON = new Set(['HTML', 'HEAD', 'BODY']);
+    const NOT_RENDERED = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'HEAD', 'TITLE', 'META', 'LINK']);
+    const RESOURCES = new Set(['SCRIPT', 'IFRAME', 'IMG', 'LINK']);
+
+    const features = {
+        hidden: [], forms: [], resources: [], iframes: [], scripts: [],
+        complexity: {total_elements: 0, max_depth: 0, input_count: 0, button_count: 0},
+        visible_text: document.body ? document.body.innerText.slice(0, options.maxTextChars) : ''
+    };
+    const complexity = features.complexity;
+""" + _HIDING_METHOD_JS + """
+    // Text nodes under element, one entry each, skipping script and style
+    // bodies - same text as DOMAnalyzer._collect_hidden_text
+    const NO_TEXT = new Set(['SCRIPT', 'STYLE']);
+    const renderedText = (element) => {
+        const parts = [];
+        const walker = document.createTreeWalker(element, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+            acceptNode: (node) => node.nodeType === Node.ELEMENT_NODE && NO_TEXT.has(node.tagName)
+                ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT
+        });
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            if (node.nodeType === Node.TEXT_NODE) {
+                const text = node.data.replace(/\\s+/g, ' ').trim();
+                if (text) parts.push(text);
+            }
+        }
+        return parts.join(' ');
+    };
+
+    // Same format as DOMAnalyzer._element_path, skeleton ancestors left out
+    const pathOf = (element) => {
+        const segments = [];
+        for (let node = element; node; node = node.parentElement) {
+            if (node !== element && SKELETON.has(node.tagName)) continue;
+            let segment = node.tagName.toLowerCase();
+            if (node.id) segment += '#' + node.id;
+            else if (node.classList.length) segment += '.' + node.classList[0];
+            segments.unshift(segment);
+        }
+        return segments.join(' > ');
+    };
+
+    // [element, depth, inside a hidden or non-rendered element]
+    const stack = [[document.documentElement, 0, false]];
+    while (stack.length) {
+        const [element, parentDepth, insideHidden] = stack.pop();
+        const tag = element.tagName;
+        const counted = !SKELETON.has(tag);
+        const depth = parentDepth + (counted ? 1 : 0);
+
+        if (counted) {
+            complexity.total_elements++;
+            if (depth > complexity.max_depth) complexity.max_depth = depth;
+        }
+
+        // Nothing under head, script, style, ... is rendered - no need to ask
+        let hidden = insideHidden || NOT_RENDERED.has(tag);
+        if (!hidden && counted) {
+            const method = hidingMethod(element);
+            if (method) {
+                hidden = true;
+                const text = renderedText(element);
+                if (text) {
+                    features.hidden.push({
+                        tag: tag.toLowerCase(), text: text.slice(0, options.maxTextChars), method, path: pathOf(element)
+                    });
+                }
+            }
+        }
+
+        if (tag === 'FORM') {
+            features.forms.push({
+                action: element.getAttribute('action') || '',
+                method: element.getAttribute('method') || 'get',
+                has_password: !!element.querySelector('input[type="password"]'),
+                has_email: !!element.querySelector('input[type="email"]')
+            });
+        } else if (tag === 'INPUT') {
+            complexity.input_count++;
+        } else if (tag === 'BUTTON') {
+            complexity.button_count++;
+        }
+
+        if (RESOURCES.has(tag)) {
+            const src = element.getAttribute('src') || element.getAttribute('href');
+            if (src) features.resources.push({tag: tag.toLowerCase(), src});
+
+            if (tag === 'SCRIPT') {
+                const scriptSrc = element.getAttribute('src');
+                const code = scriptSrc ? '' : element.textContent;
+                const risky = !scriptSrc && options.dangerousPatterns.some(p => code.includes(p));
+                features.scripts.push({src: scriptSrc, risky, snippet: risky ? code.slice(0, 200) : ''});
+            } else if (tag === 'IFRAME') {
+                features.iframes.push({
+                    src: element.getAttribute('src') || '',
+                    sandbox: element.getAttribute('sandbox') || ''
+                });
+            }
+        }
+
+        // Reversed so children come off the stack in document order
+        for (let i = element.children.length - 1; i >= 0; i--) {
+            stack.push([element.children[i], depth, hidden]);
+        }
+    }
+
+    complexity.form_count = features.forms.length;
+    return features;
+}
+"""
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+from core.security_mediator import SecurityMediator, init_local_worker
+from utils.metrics_registry import OPENMETRICS_CONTENT_TYPE
+
+
+class ScreeningService:
+    """
+    Long-running page-screening server around one SecurityMediator
+
+    Agents POST {"html": ..., "goal": ...} to /analyze and get the
+    analyze_page result back. DOM/NLP work is spread over a pre-forked
+    process pool; the LLM client, verdict cache, LLM cache and metrics are
+    shared in this process. Listens on TCP or on a Unix socket, speaking
+    minimal HTTP/1.1 with keep-alive.
+    """
+
+    REASONS = {
+        200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+        413: 'Payload Too Large', 500: 'Internal Server Error',
+    }
+
+    def __init__(self, config: Dict, llm_client=None):
+        settings = config.get('screening_service') or {}
+        self.host = settings.get('host', '127.0.0.1')
+        self.port = settings.get('port', 8765)
+        self.unix_socket = settings.get('unix_socket')
+        self.workers = settings.get('workers') or os.cpu_count() or 1
+        self.max_body_bytes = settings.get('max_body_bytes', 20 * 1024 * 1024)
+
+        self.config = config
+        self.mediator = SecurityMediator(config, llm_client=llm_client)
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        """Fork and warm the worker pool, then start listening"""
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=init_local_worker,
+            initargs=(self.config,)
+        )
+
+        # Pay the fork + analyzer setup cost now, not on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.pool, os.getpid) for _ in range(self.workers)
+        ))
+
+        if self.unix_socket:
+            if os.path.exists(self.unix_socket):
+                os.unlink(self.unix_socket)
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=self.unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+
+    @property
+    def address(self) -> str:
+        if self.unix_socket:
+            return f"unix:{self.unix_socket}"
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # Idle keep-alive clients would otherwise hold wait_closed open
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+        if self.unix_socket and os.path.exists(self.unix_socket):
+            os.unlink(self.unix_socket)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                status, payload, content_type = await self._route(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                writer.write(self._response(status, payload, content_type, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            # Malformed or oversized request - answer once and drop the connection
+            status = 413 if 'too large' in str(e) else 400
+            writer.write(self._response(status, json.dumps({'error': str(e)}).encode(), 'application/json', False))
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict, bytes]]:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+
+        try:
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise ValueError("Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0) or 0)
+        if length > self.max_body_bytes:
+            raise ValueError(f"Request body too large ({length} > {self.max_body_bytes} bytes)")
+
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), path.split('?')[0], headers, body
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, bytes, str]:
+        if path == '/analyze':
+            if method != 'POST':
+                return self._json(405, {'error': 'Use POST'})
+            return await self._analyze(body)
+
+        if path == '/health' and method == 'GET':
+            return self._json(200, {'status': 'ok', 'workers': self.workers})
+
+        if path == '/metrics' and method == 'GET':
+            telemetry = self.mediator.telemetry
+            if telemetry is None:
+                return self._json(404, {'error': 'Metrics are disabled'})
+            return 200, telemetry.render().encode('utf-8'), OPENMETRICS_CONTENT_TYPE
+
+        return self._json(404, {'error': f'No route for {method} {path}'})
+
+    async def _analyze(self, body: bytes) -> Tuple[int, bytes, str]:
+        try:
+            request = json.loads(body or b'{}')
+            html = request['html']
+            goal = request.get('goal', '')
+            if not isinstance(html, str) or not isinstance(goal, str):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return self._json(400, {'error': 'Expected a JSON object with string fields "html" and optional "goal"'})
+
+        try:
+            result = await self.mediator.analyze_page_async(html, goal, executor=self.pool)
+        except Exception as e:
+            return self._json(500, {'error': f'Analysis failed: {e}'})
+
+        return self._json(200, result)
+
+    def _json(self, status: int, payload: Dict) -> Tuple[int, bytes, str]:
+        return status, json.dumps(payload, default=str).encode('utf-8'), 'application/json'
+
+    def _response(self, status: int, body: bytes, content_type: str, keep_alive: bool) -> bytes:
+        head = (
+            f"HTTP/1.1 {status} {self.REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode('latin-1') + body
@@ -1,11 +1,22 @@
+import asyncio
+import copy
+import json
+import threading
 import time
-from typing import Dict, Optional
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 from analyzers.dom_analyzer import DOMAnalyzer
+from analyzers.parsed_document import ParsedDocument
 from analyzers.nlp_classifier import NLPThreatClassifier
+from analyzers.text_normalizer import TextNormalizer
+from analyzers.streaming_analyzer import StreamingPageAnalyzer
 from analyzers.llm_reasoner import LLMThreatReasoner
+from analyzers.llm_scheduler import LLMRequestScheduler, LLMDeadlineExceeded
 from policies.risk_calculator import MultiFactorRiskCalculator
-from utils.performance_monitor import PerformanceMonitor
+from utils.performance_monitor import PerformanceMonitor, StageTimer
 from utils.explanation_generator import ExplanationGenerator
+from utils.cache import VerdictCache, LLMResponseCache
+from utils.metrics_registry import SecurityMetrics
 
 
 class SecurityMediator:
@@ -14,25 +25,63 @@ class SecurityMediator:
     Optimized for low latency while maintaining high accuracy
     """
 
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, llm_client=None):
         # Initialize all analyzers
-        self.dom_analyzer = DOMAnalyzer()
-        self.nlp_classifier = NLPThreatClassifier()
+        self.dom_analyzer = DOMAnalyzer(
+            parser=config.get('dom_parser', 'lxml'),
+            max_depth=config.get('dom_max_depth', 256)
+        )
+        match_config = config.get('nlp_matches') or {}
+        self.nlp_classifier = NLPThreatClassifier(
+            TextNormalizer.from_config(config),
+            samples_per_category=match_config.get('samples_per_category', 5),
+            sample_seed=match_config.get('seed', 0)
+        )
 
         # 🔁 Anthropic → Gemini (NO logic change)
         self.llm_reasoner = LLMThreatReasoner(
-            config.get('gemini_api_key')
+            config.get('gemini_api_key'),
+            response_cache=LLMResponseCache.from_config(config),
+            client=llm_client,
+            scheduler=LLMRequestScheduler.from_config(config),
+            stream=config.get('llm_streaming', True)
         )
 
         self.risk_calculator = MultiFactorRiskCalculator()
-        self.performance_monitor = PerformanceMonitor()
+        monitor_config = config.get('performance_monitor') or {}
+        self.performance_monitor = PerformanceMonitor(
+            relative_accuracy=monitor_config.get('relative_accuracy', 0.01),
+            max_bins=monitor_config.get('max_bins', 2048)
+        )
         self.explainer = ExplanationGenerator()
 
+        # Repeat visits return the earlier verdict (None when disabled)
+        self.verdict_cache = VerdictCache.from_config(config)
+
         # Configuration
         self.use_llm_for_borderline = config.get('use_llm_layer', True)
         self.llm_threshold = config.get('llm_threshold', 0.4)
-
-        # Metrics tracking
+        self.streaming_early_block = config.get('streaming_early_block', True)
+
+        # Each analysis must finish within max_latency_ms; the LLM only gets
+        # what is left of it (minus a reserve for risk scoring)
+        budget_config = config.get('latency_budget') or {}
+        self.latency_budget_ms = config.get('max_latency_ms', 500) \
+            if budget_config.get('enabled', True) else None
+        self.budget_reserve_ms = budget_config.get('reserve_ms', 25)
+
+        # Start Gemini right after the DOM layer when its signals alone reach
+        # pre_threshold, so NLP runs while the request is in flight
+        speculation_config = config.get('speculative_llm') or {}
+        self.speculative_llm = speculation_config.get('enabled', False)
+        self.speculation_threshold = speculation_config.get('pre_threshold', 0.2)
+        self._speculation_pool: Optional[ThreadPoolExecutor] = None
+
+        # Pages per Gemini request in analyze_pages_batch
+        self.llm_batch_size = (config.get('llm_batch') or {}).get('max_pages', 10)
+
+        # Metrics tracking (updated from executor threads - guarded by _metrics_lock)
+        self._metrics_lock = threading.Lock()
         self.metrics = {
             'total_pages_analyzed': 0,
             'threats_detected': 0,
@@ -41,60 +90,453 @@ class SecurityMediator:
             'average_latency_ms': 0.0,
         }
 
+        # OpenMetrics registry (None when disabled), optionally served on /metrics
+        self.telemetry = SecurityMetrics.from_config(config)
+        if self.telemetry is not None:
+            if self.verdict_cache is not None:
+                self.telemetry.track_cache('verdict', self.verdict_cache.get_stats)
+            if self.llm_reasoner.response_cache is not None:
+                self.telemetry.track_cache('llm', self.llm_reasoner.response_cache.get_stats)
+
     def analyze_page(self, page_content: str, agent_goal: str = "") -> Dict:
         """
         Main entry point - analyze a page through security layers
         """
         start_time = time.time()
 
-        # Layer 1: Fast DOM analysis
-        dom_results = self.dom_analyzer.analyze(page_content)
+        cache_key, cached = self._check_cache(page_content, agent_goal)
+        if cached is not None:
+            return self._serve_cached(cached, start_time)
 
-        visible_text = self._extract_visible_text(page_content)
-        hidden_text = self._extract_hidden_text(dom_results)
+        speculation = {}
+        local = self._run_local_layers(
+            page_content,
+            on_dom_ready=self._speculation_launcher(agent_goal, start_time, speculation, self._launch_speculation)
+        )
 
-        # Layer 2: NLP classification
-        nlp_visible = self.nlp_classifier.classify_text(visible_text, context='visible')
-        nlp_hidden = self.nlp_classifier.classify_text(hidden_text, context='hidden')
+        return self._reason_and_finalize(local, agent_goal, start_time, cache_key, speculation)
 
-        nlp_results = self._combine_nlp_results(nlp_visible, nlp_hidden)
+    def analyze_features(self, features: Dict, agent_goal: str = "") -> Dict:
+        """
+        analyze_page for a feature record extracted in the browser
+        (core.browser_scripts.EXTRACT_FEATURES_JS) instead of page HTML
+        """
+        start_time = time.time()
+
+        cache_key, cached = self._check_cache(json.dumps(features, sort_keys=True), agent_goal)
+        if cached is not None:
+            return self._serve_cached(cached, start_time)
 
-        initial_risk = self._quick_risk_check(dom_results, nlp_results)
+        timer = StageTimer()
+        dom_results = self.dom_analyzer.analyze_features(features, timer=timer)
+        local = self._classify_text(dom_results, features.get('visible_text', ''), timer)
+
+        return self._reason_and_finalize(local, agent_goal, start_time, cache_key)
+
+    def _reason_and_finalize(self, local: Dict, agent_goal: str, start_time: float,
+                             cache_key: Optional[str], speculation: Optional[Dict] = None) -> Dict:
+        """LLM layer (when the local layers call for it, within the budget), then _finalize"""
+        speculation = speculation if speculation is not None else {}
 
         llm_results = None
-        if initial_risk > self.llm_threshold and self.use_llm_for_borderline:
+        degraded = None
+        if self._needs_llm(local):
+            timeout, degraded = self._llm_budget(start_time)
+
+        if degraded is None and self._needs_llm(local):
             # Layer 3: LLM reasoning (unchanged)
-            llm_results = self.llm_reasoner.analyze_intent(
-                visible_text=visible_text,
-                hidden_text=hidden_text,
-                agent_goal=agent_goal,
-                dom_analysis=dom_results
+            try:
+                with local['timer'].span('llm'):
+                    if 'future' in speculation:
+                        llm_results = speculation['future'].result()
+                    else:
+                        self._record_llm_call('intent')
+                        llm_results = self.llm_reasoner.analyze_intent(
+                            visible_text=local['visible_text'],
+                            hidden_text=local['hidden_text'],
+                            agent_goal=agent_goal,
+                            dom_analysis=local['dom_results'],
+                            timeout=timeout
+                        )
+            except LLMDeadlineExceeded as e:
+                degraded = f"LLM reasoning cut off by the latency budget ({e})"
+
+        self._settle_speculation(local, speculation)
+        return self._finalize(local, llm_results, start_time, cache_key, degraded)
+
+    async def analyze_page_async(self, page_content: str, agent_goal: str = "",
+                                 executor: Optional[Executor] = None) -> Dict:
+        """
+        asyncio-native analyze_page - many pages can be in flight on one loop
+
+        CPU-bound DOM/NLP work runs in the executor (the loop's default thread
+        pool if None) and the Gemini call is awaited without blocking the loop.
+        A ProcessPoolExecutor must have been created with
+        initializer=init_local_worker; only DOM/NLP runs in its workers.
+        """
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        in_process = isinstance(executor, ProcessPoolExecutor)
+
+        # Hashing the page (and a SQLite read on a disk hit) stays off the loop;
+        # the cache lives in this process, so a process pool can't do it
+        cache_key, cached = None, None
+        if self.verdict_cache is not None:
+            cache_key, cached = await loop.run_in_executor(
+                None if in_process else executor, self._check_cache, page_content, agent_goal
             )
+        if cached is not None:
+            return self._serve_cached(cached, start_time)
+
+        speculation = {}
+        if in_process:
+            # No speculation - the DOM-ready hook cannot cross the process boundary
+            local = await loop.run_in_executor(executor, run_local_layers, page_content)
+        else:
+            def launch_on_loop(visible_text, hidden_text, goal, dom_results, timeout, discard):
+                return asyncio.run_coroutine_threadsafe(
+                    self.llm_reasoner.analyze_intent_async(visible_text, hidden_text, goal, dom_results,
+                                                           timeout, discard),
+                    loop
+                )
+
+            on_dom_ready = self._speculation_launcher(agent_goal, start_time, speculation, launch_on_loop)
+            local = await loop.run_in_executor(executor, self._run_local_layers, page_content, on_dom_ready)
 
-        # Layer 4: Risk calculation
-        risk_report = self.risk_calculator.calculate_risk(
-            dom_results=dom_results,
-            nlp_results=nlp_results,
-            llm_results=llm_results
+        llm_results = None
+        degraded = None
+        if self._needs_llm(local):
+            timeout, degraded = self._llm_budget(start_time)
+
+        if degraded is None and self._needs_llm(local):
+            try:
+                with local['timer'].span('llm'):
+                    if 'future' in speculation:
+                        llm_results = await asyncio.wrap_future(speculation['future'])
+                    else:
+                        self._record_llm_call('intent')
+                        llm_results = await self.llm_reasoner.analyze_intent_async(
+                            visible_text=local['visible_text'],
+                            hidden_text=local['hidden_text'],
+                            agent_goal=agent_goal,
+                            dom_analysis=local['dom_results'],
+                            timeout=timeout
+                        )
+            except LLMDeadlineExceeded as e:
+                degraded = f"LLM reasoning cut off by the latency budget ({e})"
+
+        self._settle_speculation(local, speculation)
+
+        if in_process:
+            # Caches and metrics live in this process
+            return self._finalize(local, llm_results, start_time, cache_key, degraded)
+
+        return await loop.run_in_executor(
+            executor, self._finalize, local, llm_results, start_time, cache_key, degraded
         )
 
-        explanation = self.explainer.generate_explanation(
-            risk_report=risk_report,
-            dom_results=dom_results,
-            nlp_results=nlp_results,
-            llm_results=llm_results
+    def analyze_pages_batch(self, pages: Sequence[Tuple[str, str]]) -> List[Dict]:
+        """
+        Analyze many (page_content, agent_goal) pairs for offline re-scans
+
+        DOM/NLP runs page by page as in analyze_page, but the borderline
+        pages share Gemini requests (llm_batch.max_pages per request). No
+        latency budget applies. Results come back in input order.
+        """
+        results: List[Optional[Dict]] = [None] * len(pages)
+        pending = []
+
+        for index, (page_content, agent_goal) in enumerate(pages):
+            start_time = time.time()
+            cache_key, cached = self._check_cache(page_content, agent_goal)
+            if cached is not None:
+                results[index] = self._serve_cached(cached, start_time)
+                continue
+
+            local = self._run_local_layers(page_content)
+            pending.append((index, agent_goal, local, cache_key, time.time() - start_time))
+
+        borderline = [item for item in pending if self._needs_llm(item[2])]
+        llm_started = time.perf_counter()
+        verdicts = self.llm_reasoner.analyze_intent_batch(
+            [
+                {
+                    'page_id': index,
+                    'visible_text': local['visible_text'],
+                    'hidden_text': local['hidden_text'],
+                    'agent_goal': agent_goal,
+                    'dom_analysis': local['dom_results'],
+                }
+                for index, agent_goal, local, _, _ in borderline
+            ],
+            batch_size=self.llm_batch_size,
+            # One count per request actually made, not per page it covers
+            on_request=lambda: self._record_llm_call('intent')
+        ) if borderline else []
+        llm_seconds = time.perf_counter() - llm_started
+
+        llm_results = {}
+        for (index, _, local, _, _), verdict in zip(borderline, verdicts):
+            # Each page is charged the whole shared wait, as if it had made the call alone
+            local['timer'].spans['llm'] = llm_seconds * 1000
+            llm_results[index] = verdict
+
+        for index, _, local, cache_key, local_seconds in pending:
+            llm_share = llm_seconds if index in llm_results else 0.0
+            # Latency covers this page's own work, not the pages queued before it
+            start_time = time.time() - local_seconds - llm_share
+            # A borderline page without a verdict was cut off by a deadline
+            degraded = "LLM reasoning cut off by a deadline" \
+                if index in llm_results and llm_results[index] is None else None
+            results[index] = self._finalize(local, llm_results.get(index), start_time, cache_key, degraded)
+
+        return results
+
+    def analyze_mutations(self, fragments: Sequence[str], agent_goal: str, previous: Dict) -> Dict:
+        """
+        Re-screen a page after it changed, from its changed subtrees alone
+
+        fragments are the outerHTML of added or modified subtrees, none of
+        them hidden or inside a hidden element (a fragment is parsed without
+        its ancestors and the page's stylesheets, so DRAIN_MUTATIONS_JS
+        sends a full re-screen instead); previous is the page's last
+        analyze_page / analyze_mutations result. DOM and
+        NLP run on the fragments only and their findings are merged into
+        previous, so the page's risk can only be raised by new content
+        (removed content is not subtracted). Gemini is asked again only when
+        the fragments add findings and the merged risk crosses llm_threshold.
+        """
+        start_time = time.time()
+
+        local = self._run_local_layers(''.join(fragments))
+        delta_dom = local['dom_results']
+        delta_nlp = local['nlp_results']
+
+        base = previous.get('detailed_analysis') or {}
+        local['dom_results'] = self._merge_dom_results(base.get('dom') or {}, delta_dom)
+        if base.get('nlp'):
+            local['nlp_results'] = self._combine_nlp_results(base['nlp'], delta_nlp)
+        local['initial_risk'] = self._quick_risk_check(local['dom_results'], local['nlp_results'])
+
+        new_findings = bool(delta_dom['hidden_elements'] or delta_dom['suspicious_forms']
+                            or delta_nlp['is_malicious'])
+
+        llm_results = base.get('llm')
+        degraded = None
+        if new_findings and self._needs_llm(local):
+            timeout, degraded = self._llm_budget(start_time)
+            if degraded is None:
+                try:
+                    with local['timer'].span('llm'):
+                        self._record_llm_call('intent')
+                        llm_results = self.llm_reasoner.analyze_intent(
+                            visible_text=local['visible_text'],
+                            hidden_text=self._extract_hidden_text(local['dom_results']),
+                            agent_goal=agent_goal,
+                            dom_analysis=local['dom_results'],
+                            timeout=timeout
+                        )
+                except LLMDeadlineExceeded as e:
+                    degraded = f"LLM reasoning cut off by the latency budget ({e})"
+
+        result = self._finalize(local, llm_results, start_time, None, degraded)
+        result['performance']['mutation_fragments'] = len(fragments)
+        return result
+
+    def _merge_dom_results(self, base: Dict, delta: Dict) -> Dict:
+        """DOM findings of a page plus those of its changed subtrees"""
+        def merge_unique(name: str) -> List[Dict]:
+            # A re-rendered subtree repeats the findings it had before
+            merged = list(base.get(name, []))
+            seen = {repr(item) for item in merged}
+            for item in delta.get(name, []):
+                if repr(item) not in seen:
+                    seen.add(repr(item))
+                    merged.append(item)
+            return merged
+
+        # Fragments may be re-rendered parts of the page already counted, so
+        # the counts are not added up - the larger one stands
+        base_scripts = base.get('script_analysis') or {}
+        delta_scripts = delta['script_analysis']
+        scripts = {
+            key: max(base_scripts.get(key, 0), delta_scripts[key])
+            for key in ('total_scripts', 'inline_scripts', 'external_scripts', 'risky_inline_count')
+        }
+        scripts['external_sources'] = list(dict.fromkeys(
+            base_scripts.get('external_sources', []) + delta_scripts['external_sources']
+        ))
+
+        base_complexity = base.get('dom_complexity') or {}
+        delta_complexity = delta['dom_complexity']
+        complexity = {
+            key: max(base_complexity.get(key, 0), delta_complexity[key])
+            for key in ('total_elements', 'form_count', 'input_count', 'button_count')
+        }
+        complexity['max_depth'] = max(base_complexity.get('max_depth', 0), delta_complexity['max_depth'])
+        complexity['depth_limit_exceeded'] = bool(
+            base_complexity.get('depth_limit_exceeded') or delta_complexity['depth_limit_exceeded']
         )
 
-        latency_ms = (time.time() - start_time) * 1000
-        self.performance_monitor.record_analysis(latency_ms)
+        return {
+            'hidden_elements': merge_unique('hidden_elements'),
+            'suspicious_forms': merge_unique('suspicious_forms'),
+            'external_resources': merge_unique('external_resources'),
+            'iframe_analysis': merge_unique('iframe_analysis'),
+            'script_analysis': scripts,
+            'dom_complexity': complexity,
+        }
+
+    def _speculation_launcher(self, agent_goal: str, start_time: float, speculation: Dict,
+                              launch: Callable[..., Future]) -> Optional[Callable]:
+        """
+        DOM-ready hook for _run_local_layers that starts the LLM early
+
+        When the DOM-only risk reaches pre_threshold, launch(visible_text,
+        hidden_text, goal, dom_results, timeout, discard) starts
+        analyze_intent and its Future is left in speculation['future'];
+        completing speculation['discard'] withdraws the request
+        """
+        if not (self.speculative_llm and self.use_llm_for_borderline):
+            return None
+
+        def on_dom_ready(dom_results: Dict, visible_text: str, hidden_text: str):
+            if self._dom_quick_risk(dom_results) < self.speculation_threshold:
+                return
+
+            timeout, no_budget = self._llm_budget(start_time)
+            if no_budget is None:
+                self._record_llm_call('intent')
+                speculation['discard'] = Future()
+                speculation['future'] = launch(visible_text, hidden_text, agent_goal, dom_results, timeout,
+                                               speculation['discard'])
+
+        return on_dom_ready
+
+    def _launch_speculation(self, visible_text: str, hidden_text: str, agent_goal: str,
+                            dom_results: Dict, timeout: Optional[float], discard: Future) -> Future:
+        if self._speculation_pool is None:
+            self._speculation_pool = ThreadPoolExecutor(thread_name_prefix='llm-speculation')
+        return self._speculation_pool.submit(
+            self.llm_reasoner.analyze_intent, visible_text, hidden_text, agent_goal, dom_results, timeout, discard
+        )
+
+    def _settle_speculation(self, local: Dict, speculation: Dict):
+        """Note whether a speculative LLM request was used or thrown away"""
+        if 'future' in speculation:
+            if self._needs_llm(local):
+                local['speculation'] = 'used'
+            else:
+                local['speculation'] = 'discarded'
+                # Withdraw it - a request still queued in the scheduler is never sent
+                speculation['discard'].set_result(None)
+
+    def _llm_budget(self, start_time: float) -> Tuple[Optional[float], Optional[str]]:
+        """
+        (LLM timeout in seconds, degraded reason) for an analysis started at start_time
+        The timeout is None without a budget; the reason is set when nothing is left
+        """
+        if self.latency_budget_ms is None:
+            return None, None
 
-        self.metrics['total_pages_analyzed'] += 1
-        if risk_report['action'] in ['BLOCK', 'CONFIRM']:
-            self.metrics['threats_detected'] += 1
-        if risk_report['action'] == 'BLOCK':
-            self.metrics['actions_blocked'] += 1
+        elapsed_ms = (time.time() - start_time) * 1000
+        remaining_ms = self.latency_budget_ms - self.budget_reserve_ms - elapsed_ms
+        if remaining_ms <= 0:
+            return None, f"No latency budget left for LLM reasoning ({elapsed_ms:.0f} ms spent locally)"
+
+        return remaining_ms / 1000, None
+
+    def _check_cache(self, page_content: str, agent_goal: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Return (cache key, cached verdict) - both None when caching is off"""
+        if self.verdict_cache is None:
+            return None, None
+
+        cache_key = self.verdict_cache.make_key(page_content, agent_goal)
+        return cache_key, self.verdict_cache.get(cache_key)
+
+    def _run_local_layers(self, page_content: str,
+                          on_dom_ready: Optional[Callable[[Dict, str, str], None]] = None) -> Dict:
+        """
+        DOM + NLP layers - everything that runs without the LLM
+
+        on_dom_ready(dom_results, visible_text, hidden_text) is called as soon
+        as the DOM layer is done, before NLP
+        """
+        # Every stage gets a span; they end up in the performance block
+        timer = StageTimer()
+
+        # Parse once - every layer shares the same document
+        document = timer.run(
+            'parse', ParsedDocument, page_content,
+            parser=self.dom_analyzer.parser,
+            max_depth_cap=self.dom_analyzer.max_depth
+        )
+
+        # Layer 1: Fast DOM analysis
+        dom_results = self.dom_analyzer.analyze(document, timer=timer)
+
+        visible_text = timer.run('text.visible', self._extract_visible_text, document)
+        return self._classify_text(dom_results, visible_text, timer, on_dom_ready)
+
+    def _classify_text(self, dom_results: Dict, visible_text: str, timer: StageTimer,
+                       on_dom_ready: Optional[Callable[[Dict, str, str], None]] = None) -> Dict:
+        """Hidden-text extraction and the NLP layer, on top of DOM results"""
+        hidden_text = timer.run('text.hidden', self._extract_hidden_text, dom_results)
+
+        if on_dom_ready is not None:
+            on_dom_ready(dom_results, visible_text, hidden_text)
+
+        # Layer 2: NLP classification
+        nlp_visible = timer.run('nlp.visible', self.nlp_classifier.classify_text, visible_text, context='visible')
+        nlp_hidden = timer.run('nlp.hidden', self.nlp_classifier.classify_text, hidden_text, context='hidden')
+
+        nlp_results = self._combine_nlp_results(nlp_visible, nlp_hidden)
 
         return {
+            'dom_results': dom_results,
+            'visible_text': visible_text,
+            'hidden_text': hidden_text,
+            'nlp_results': nlp_results,
+            'initial_risk': timer.run('risk.quick', self._quick_risk_check, dom_results, nlp_results),
+            'timer': timer,
+        }
+
+    def _needs_llm(self, local: Dict) -> bool:
+        return local['initial_risk'] > self.llm_threshold and self.use_llm_for_borderline
+
+    def _finalize(self, local: Dict, llm_results: Optional[Dict],
+                  start_time: float, cache_key: Optional[str],
+                  degraded: Optional[str] = None) -> Dict:
+        """
+        Risk calculation, explanation and bookkeeping
+
+        degraded is the reason the LLM layer was skipped or cut off; the
+        verdict then rests on DOM + NLP alone and is flagged as such
+        """
+        dom_results = local['dom_results']
+        nlp_results = local['nlp_results']
+        timer = local['timer']
+
+        # Layer 4: Risk calculation
+        with timer.span('risk.calculation'):
+            risk_report = self.risk_calculator.calculate_risk(
+                dom_results=dom_results,
+                nlp_results=nlp_results,
+                llm_results=llm_results
+            )
+
+        with timer.span('explanation'):
+            explanation = self.explainer.generate_explanation(
+                risk_report=risk_report,
+                dom_results=dom_results,
+                nlp_results=nlp_results,
+                llm_results=llm_results
+            )
+
+        latency_ms = (time.time() - start_time) * 1000
+        self._record_verdict(risk_report['action'], latency_ms, timer.spans)
+
+        result = {
             'risk_score': risk_report['total_risk_score'],
             'action': risk_report['action'],
             'confidence': risk_report['confidence'],
@@ -107,35 +549,191 @@ class SecurityMediator:
             },
             'performance': {
                 'latency_ms': round(latency_ms, 2),
-                'layers_used': self._count_layers_used(llm_results)
-            }
+                'layers_used': self._count_layers_used(llm_results),
+                'cache_hit': False,
+                'layer_timings_ms': timer.as_dict()
+            },
+            'degraded': degraded is not None
         }
 
+        if 'speculation' in local:
+            result['performance']['llm_speculation'] = local['speculation']
+
+        if degraded is not None:
+            result['degraded_reason'] = degraded
+            if self.telemetry is not None:
+                self.telemetry.observe_degraded()
+
+        # Transient LLM failures (and timeouts) are not worth remembering
+        llm_failed = bool(llm_results) and llm_results.get('threat_type') == 'error'
+        if cache_key is not None and not llm_failed and degraded is None:
+            # A private copy - the caller may modify the result it gets back
+            self.verdict_cache.set(cache_key, copy.deepcopy(result))
+
+        return result
+
+    def analyze_stream(self, chunks: Iterable[str], agent_goal: str = "") -> Dict:
+        """
+        Analyze a page as its HTML arrives
+
+        Chunks are screened incrementally; a critical indicator (hidden
+        instruction override, external password form) returns a BLOCK verdict
+        immediately without reading the rest of the stream. Otherwise the
+        full page goes through analyze_page once the stream ends - so the
+        chunks are kept until then, and a page that is not blocked early
+        costs as much memory as analyze_page on the whole HTML.
+        """
+        start_time = time.time()
+        screen = StreamingPageAnalyzer(self.dom_analyzer, self.nlp_classifier)
+        received = []
+
+        for chunk in chunks:
+            received.append(chunk)
+            if self.streaming_early_block and screen.feed(chunk):
+                return self._early_block(screen, start_time)
+
+        if self.streaming_early_block and screen.close():
+            return self._early_block(screen, start_time)
+
+        return self.analyze_page(''.join(received), agent_goal)
+
+    def _early_block(self, screen: StreamingPageAnalyzer, start_time: float) -> Dict:
+        """BLOCK verdict built from the partial results of a streaming screen"""
+        indicator = screen.critical_indicator
+        dom_results = screen.get_dom_results()
+        nlp_results = screen.nlp_results or self.nlp_classifier.classify_text('')
+        timer = StageTimer()
+
+        with timer.span('risk.calculation'):
+            risk_report = self.risk_calculator.calculate_risk(
+                dom_results=dom_results,
+                nlp_results=nlp_results
+            )
+
+        # Critical indicators block regardless of the weighted score
+        block_score = self.risk_calculator.THRESHOLDS['block']
+        risk_report['total_risk_score'] = max(risk_report['total_risk_score'], block_score)
+        risk_report['action'] = 'BLOCK'
+        risk_report['threat_indicators'].insert(0, f"Early exit: {indicator['reason']}")
+        risk_report['mitigations'] = self.risk_calculator._suggest_mitigations(
+            risk_report['total_risk_score'], 'BLOCK'
+        )
+
+        with timer.span('explanation'):
+            explanation = self.explainer.generate_explanation(
+                risk_report=risk_report,
+                dom_results=dom_results,
+                nlp_results=nlp_results
+            )
+
+        latency_ms = (time.time() - start_time) * 1000
+        self._record_verdict('BLOCK', latency_ms, timer.spans)
+
+        return {
+            'risk_score': risk_report['total_risk_score'],
+            'action': 'BLOCK',
+            'confidence': risk_report['confidence'],
+            'explanation': explanation,
+            'detailed_analysis': {
+                'dom': dom_results,
+                'nlp': nlp_results,
+                'llm': None,
+                'risk_breakdown': risk_report,
+                'early_exit': indicator
+            },
+            'performance': {
+                'latency_ms': round(latency_ms, 2),
+                'layers_used': self._count_layers_used(None),
+                'cache_hit': False,
+                'early_exit': True,
+                'chars_analyzed': screen.chars_fed,
+                'layer_timings_ms': timer.as_dict()
+            },
+            'degraded': False
+        }
+
+    def _serve_cached(self, cached: Dict, start_time: float) -> Dict:
+        """Return a cached verdict with its own performance block"""
+        latency_ms = (time.time() - start_time) * 1000
+        self._record_verdict(cached['action'], latency_ms)
+
+        # Every hit gets its own copy, so callers cannot change the cached verdict
+        result = copy.deepcopy(cached)
+        # The original stage timings say nothing about this lookup
+        result['performance'] = dict(
+            cached['performance'],
+            latency_ms=round(latency_ms, 3),
+            cache_hit=True,
+            layer_timings_ms={}
+        )
+        return result
+
+    def _record_verdict(self, action: str, latency_ms: float, spans: Optional[Dict] = None):
+        """Book one finished analysis into the monitor, metrics and telemetry"""
+        spans = spans or {}
+        self.performance_monitor.record_analysis(latency_ms)
+        self.performance_monitor.record_spans(spans)
+
+        with self._metrics_lock:
+            self.metrics['total_pages_analyzed'] += 1
+            if action in ['BLOCK', 'CONFIRM']:
+                self.metrics['threats_detected'] += 1
+            if action == 'BLOCK':
+                self.metrics['actions_blocked'] += 1
+
+            # Running mean over every analysis
+            count = self.metrics['total_pages_analyzed']
+            average = self.metrics['average_latency_ms']
+            self.metrics['average_latency_ms'] = average + (latency_ms - average) / count
+
+        if self.telemetry is not None:
+            self.telemetry.observe_analysis(
+                action, latency_ms,
+                layers=self.performance_monitor.rollup(spans),
+                stages=spans
+            )
+
+    def _record_llm_call(self, kind: str):
+        if self.telemetry is not None:
+            self.telemetry.observe_llm_call(kind)
+
     def validate_action(self, action: str, page_context: Dict) -> Dict:
         """
         Validate a specific agent action before execution
         """
         if page_context.get('risk_score', 0) > 0.3:
+            self._record_llm_call('action')
             validation = self.llm_reasoner.validate_agent_action(
                 intended_action=action,
                 page_context=str(page_context.get('visible_text', ''))
             )
             return validation
 
+        return self._low_risk_validation()
+
+    async def validate_action_async(self, action: str, page_context: Dict) -> Dict:
+        """
+        asyncio-native validate_action
+        """
+        if page_context.get('risk_score', 0) > 0.3:
+            self._record_llm_call('action')
+            return await self.llm_reasoner.validate_agent_action_async(
+                intended_action=action,
+                page_context=str(page_context.get('visible_text', ''))
+            )
+
+        return self._low_risk_validation()
+
+    def _low_risk_validation(self) -> Dict:
         return {
             'is_safe': True,
             'risk_level': 'low',
             'recommendation': 'proceed'
         }
 
-    def _extract_visible_text(self, page_content: str) -> str:
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(page_content, 'html.parser')
-
-        for script in soup(['script', 'style']):
-            script.decompose()
-
-        return soup.get_text(separator=' ', strip=True)
+    def _extract_visible_text(self, document: ParsedDocument) -> str:
+        # Collected during the single tree walk (script/style excluded)
+        return document.visible_text
 
     def _extract_hidden_text(self, dom_results: Dict) -> str:
         hidden_elements = dom_results.get('hidden_elements', [])
@@ -147,13 +745,15 @@ class SecurityMediator:
             'is_malicious': visible['is_malicious'] or hidden['is_malicious'],
             'confidence': max(visible['confidence'], hidden['confidence']),
             'threats': list(set(visible['threats'] + hidden['threats'])),
-            'matched_patterns': visible['matched_patterns'] + hidden['matched_patterns'],
             'severity': max(
                 visible['severity'],
                 hidden['severity'],
                 key=lambda x: ['none', 'low', 'medium', 'high', 'critical'].index(x)
-            )
+            ),
+            'truncated': visible.get('truncated', False) or hidden.get('truncated', False)
         }
+        # Counters add up; samples stay within samples_per_category
+        combined.update(self.nlp_classifier.combine_matches(visible, hidden))
         return combined
 
     def _quick_risk_check(self, dom: Dict, nlp: Dict) -> float:
@@ -170,8 +770,57 @@ class SecurityMediator:
 
         return min(score, 1.0)
 
+    def _dom_quick_risk(self, dom: Dict) -> float:
+        """DOM share of _quick_risk_check - known before NLP has run"""
+        score = 0.0
+
+        if dom.get('hidden_elements'):
+            score += 0.2
+
+        if dom.get('suspicious_forms'):
+            score += 0.3
+
+        return score
+
     def _count_layers_used(self, llm_results) -> int:
         return 3 if llm_results else 2
 
     def get_metrics(self) -> Dict:
-        return self.metrics.copy()
+        with self._metrics_lock:
+            metrics = self.metrics.copy()
+        metrics['average_latency_ms'] = round(metrics['average_latency_ms'], 2)
+        if self.verdict_cache is not None:
+            metrics['verdict_cache'] = self.verdict_cache.get_stats()
+        if self.llm_reasoner.response_cache is not None:
+            metrics['llm_cache'] = self.llm_reasoner.response_cache.get_stats()
+        if self.llm_reasoner.scheduler is not None:
+            metrics['llm_scheduler'] = self.llm_reasoner.scheduler.get_stats()
+        return metrics
+
+
+# DOM/NLP-only mediator of a process-pool worker (see init_local_worker)
+_local_mediator: Optional[SecurityMediator] = None
+
+
+def init_local_worker(config: Dict):
+    """
+    ProcessPoolExecutor initializer - builds this worker's analyzers once
+
+    Workers only run the local layers, so the LLM, caches and metrics stay
+    with the parent process and are shared by every worker
+    """
+    global _local_mediator
+    worker_config = dict(
+        config,
+        use_llm_layer=False,
+        verdict_cache={'enabled': False},
+        llm_cache={'enabled': False},
+        llm_scheduler={'enabled': False},
+        metrics={'enabled': False}
+    )
+    _local_mediator = SecurityMediator(worker_config)
+
+
+def run_local_layers(page_content: str) -> Dict:
+    """DOM + NLP layers inside a worker set up by init_local_worker"""
+    return _local_mediator._run_local_layers(page_content)
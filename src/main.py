@@ -13,23 +13,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 from core.agent import AgenticBrowser
 from core.security_mediator import SecurityMediator
 from utils.metrics_collector import MetricsCollector
-import yaml
-
-
-def load_config():
-    """Load configuration"""
-    config_path = Path(__file__).parent.parent / 'config.yaml'
-
-    if config_path.exists():
-        with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
-    else:
-        return {
-            'gemini_api_key': os.getenv('GEMINI_API_KEY', ''),
-            'use_llm_layer': True,
-            'llm_threshold': 0.4,
-            'headless': False
-        }
+from utils.config_loader import load_config
 
 
 def demo_legitimate_task():
@@ -52,6 +52,11 @@ class MultiFactorRiskCalculator:
         # Normalize to 0-1
         total_risk = max(0.0, min(1.0, total_risk))
         
+        # Text past the NLP limit was never classified - padding could be
+        # hiding an injection behind it, so a human has to look
+        if nlp_results and nlp_results.get('truncated'):
+            total_risk = max(total_risk, self.THRESHOLDS['confirm'])
+        
         # Determine action
         action = self._determine_action(total_risk)
         
@@ -184,6 +189,8 @@ class MultiFactorRiskCalculator:
         if nlp and nlp.get('threats'):
             for threat in nlp['threats']:
                 indicators.append(f"NLP detected: {threat}")
+        if nlp and nlp.get('truncated'):
+            indicators.append("Text too long - NLP scanned only its beginning")
         
         if llm and llm.get('is_malicious'):
             indicators.append(f"LLM assessment: {llm.get('threat_type')}")
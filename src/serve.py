@@ -0,0 +1,58 @@
+"""
+Secure Agentic Browser - Page Screening Service
+
+Usage:
+    python src/serve.py [--host HOST] [--port PORT] [--unix-socket PATH] [--workers N]
+
+Agents POST {"html": "...", "goal": "..."} to /analyze and receive the
+SecurityMediator.analyze_page result as JSON. GET /health and GET /metrics
+are also served. Defaults come from the screening_service block of config.yaml.
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from core.screening_service import ScreeningService
+from utils.config_loader import load_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page screening service")
+    parser.add_argument('--config', help='path to config.yaml')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--unix-socket', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, help='DOM/NLP worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    settings = dict(config.get('screening_service') or {})
+    for key in ('host', 'port', 'unix_socket', 'workers'):
+        value = getattr(args, key)
+        if value is not None:
+            settings[key] = value
+    config['screening_service'] = settings
+
+    service = ScreeningService(config)
+
+    async def run():
+        await service.start()
+        print(f"🛡️  Screening service listening on {service.address} ({service.workers} workers)")
+        try:
+            await service.serve_forever()
+        finally:
+            await service.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n👋 Screening service stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,30 @@
 Utility modules: Performance monitoring, metrics, and explanations
 """
 
-from .performance_monitor import PerformanceMonitor
+from .performance_monitor import PerformanceMonitor, StageTimer
 from .metrics_collector import MetricsCollector
 from .explanation_generator import ExplanationGenerator
+from .quantile_sketch import QuantileSketch
+from .metrics_registry import MetricsRegistry, SecurityMetrics, start_metrics_server
+from .config_loader import load_config
+from .cache import VerdictCache, LLMResponseCache, SqliteCacheStore
+from .response_parser import IncrementalJSONParser, ResponseSchema, ResponseParseError, parse_response
 
 __all__ = [
     'PerformanceMonitor',
+    'StageTimer',
+    'QuantileSketch',
+    'MetricsRegistry',
+    'SecurityMetrics',
+    'start_metrics_server',
+    'load_config',
     'MetricsCollector',
-    'ExplanationGenerator'
+    'ExplanationGenerator',
+    'VerdictCache',
+    'LLMResponseCache',
+    'SqliteCacheStore',
+    'IncrementalJSONParser',
+    'ResponseSchema',
+    'ResponseParseError',
+    'parse_response'
 ]
\ No newline at end of file
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+class SqliteCacheStore:
+    """
+    Persistent key/value tier backed by SQLite
+    Survives restarts and can be shared by several processes (WAL mode)
+
+    Expired and surplus rows are trimmed every trim_interval writes rather
+    than on each one, so the table may briefly run past max_entries by
+    that many rows.
+    """
+
+    # Writes between trims, at most (smaller for small tables)
+    TRIM_INTERVAL = 1000
+
+    def __init__(self, path: str, table: str, max_entries: int = 100000,
+                 ttl_seconds: float = 3600):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.trim_interval = max(1, min(self.TRIM_INTERVAL, max_entries // 10))
+        self._writes_since_trim = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_created ON {table} (created_at)'
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the stored value, or None if missing or expired"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict, float]]:
+        """(value, created_at), or None if missing or expired"""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, created_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        value, created_at = row
+        if time.time() - created_at > self.ttl_seconds:
+            return None
+
+        return json.loads(value), created_at
+
+    def set(self, key: str, value: Dict):
+        """Store a JSON-serializable value, periodically evicting expired rows and the oldest past the size limit"""
+        payload = json.dumps(value)
+
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)',
+                (key, payload, time.time())
+            )
+            self._writes_since_trim += 1
+            if self._writes_since_trim >= self.trim_interval:
+                self._trim()
+            self._conn.commit()
+
+    def _trim(self):
+        """Drop expired rows, then the oldest past max_entries (caller holds the lock)"""
+        self._writes_since_trim = 0
+        self._conn.execute(
+            f'DELETE FROM {self.table} WHERE created_at < ?',
+            (time.time() - self.ttl_seconds,)
+        )
+        self._conn.execute(
+            f'DELETE FROM {self.table} WHERE key IN ('
+            f'SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table}')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class VerdictCache:
+    """
+    Bounded LRU + TTL cache of analyze_page results
+    Keyed on a normalized content hash plus the agent goal, with an
+    optional SQLite tier that survives restarts
+
+    Cached results are shared - callers must treat them as read-only
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 900,
+                 sqlite_path: str = None, sqlite_max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+
+        self.disk = None
+        if sqlite_path:
+            self.disk = SqliteCacheStore(
+                sqlite_path, 'verdicts',
+                max_entries=sqlite_max_entries,
+                ttl_seconds=ttl_seconds
+            )
+
+        self.stats = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['VerdictCache']:
+        """Build from the verdict_cache block of config.yaml (None if disabled)"""
+        settings = config.get('verdict_cache') or {}
+        if not settings.get('enabled', False):
+            return None
+
+        return cls(
+            max_entries=settings.get('max_entries', 1024),
+            ttl_seconds=settings.get('ttl_seconds', 900),
+            sqlite_path=settings.get('sqlite_path'),
+            sqlite_max_entries=settings.get('sqlite_max_entries', 100000),
+        )
+
+    def make_key(self, page_content: str, agent_goal: str = "") -> str:
+        """Hash of the whitespace-normalized page plus the agent goal"""
+        normalized = ' '.join(page_content.split())
+
+        digest = hashlib.sha256()
+        digest.update(normalized.encode('utf-8', errors='surrogatepass'))
+        digest.update(b'\x00')
+        digest.update(agent_goal.encode('utf-8', errors='surrogatepass'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return result
+
+                del self._entries[key]
+                self.stats['expirations'] += 1
+
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                result, created_at = entry
+                with self._lock:
+                    self.stats['hits'] += 1
+                    self.stats['disk_hits'] += 1
+                    # Expires when the disk row does, not a full TTL from now
+                    self._store(key, result, created_at)
+                return result
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def set(self, key: str, result: Dict):
+        with self._lock:
+            self._store(key, result, time.time())
+
+        if self.disk is not None:
+            self.disk.set(key, result)
+
+    def _store(self, key: str, result: Dict, created_at: float):
+        """Insert into the memory tier (caller holds the lock)"""
+        self._entries[key] = (created_at + self.ttl_seconds, result)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._entries)
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class LLMResponseCache:
+    """
+    Prompt-fingerprint cache for parsed LLM responses
+    Stored on local disk (SQLite) so every process on the host shares it
+    """
+
+    def __init__(self, sqlite_path: str, max_entries: int = 50000,
+                 ttl_seconds: float = 86400):
+        self.store = SqliteCacheStore(
+            sqlite_path, 'llm_responses',
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds
+        )
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['LLMResponseCache']:
+        """Build from the llm_cache block of config.yaml (None if disabled)"""
+        settings = config.get('llm_cache') or {}
+        if not settings.get('enabled', False):
+            return None
+
+        return cls(
+            sqlite_path=settings.get('sqlite_path', '.cache/llm_responses.sqlite'),
+            max_entries=settings.get('max_entries', 50000),
+            ttl_seconds=settings.get('ttl_seconds', 86400),
+        )
+
+    def fingerprint(self, model: str, prompt: str) -> str:
+        """Identical prompts to the same model share a fingerprint"""
+        digest = hashlib.sha256()
+        digest.update(model.encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(prompt.encode('utf-8', errors='surrogatepass'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        response = self.store.get(key)
+
+        with self._lock:
+            self.stats['hits' if response is not None else 'misses'] += 1
+
+        return response
+
+    def set(self, key: str, response: Dict):
+        self.store.set(key, response)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,23 @@
+import os
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import yaml
+
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / 'config.yaml'
+
+
+def load_config(path: Optional[Union[str, Path]] = None) -> Dict:
+    """Load config.yaml (repo root by default), with defaults if it is missing"""
+    config_path = Path(path) if path else DEFAULT_CONFIG_PATH
+
+    if config_path.exists():
+        with open(config_path, 'r') as f:
+            return yaml.safe_load(f)
+    else:
+        return {
+            'gemini_api_key': os.getenv('GEMINI_API_KEY', ''),
+            'use_llm_layer': True,
+            'llm_threshold': 0.4,
+            'headless': False
+        }
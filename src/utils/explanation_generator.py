@@ -79,6 +79,10 @@ class ExplanationGenerator:
                 for pattern in patterns[:3]:
                     explanation_parts.append(f"     • \"{pattern}\"")
         
+        if nlp_results.get('truncated'):
+            explanation_parts.append("• NLP Coverage: text past the scan limit was not classified")
+            explanation_parts.append("  └─ Hidden or padded content may not have been checked")
+        
         # LLM reasoning
         if llm_results:
             explanation_parts.append(f"• AI Analysis: {llm_results.get('threat_type', 'unknown').upper()}")
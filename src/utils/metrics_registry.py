@@ -0,0 +1,286 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Latency buckets in seconds - dense around the 500 ms SLA
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for a labelled metric family"""
+
+    TYPE = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [
+            f"# TYPE {self.name} {self.TYPE}",
+            f"# HELP {self.name} {_escape(self.documentation)}",
+        ] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (exposed as <name>_total)"""
+
+    TYPE = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Unlabelled counters are exposed (as 0) before their first increment
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """Current value, read from a callback at scrape time"""
+
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set_function(self, func: Callable[[], float], **labels):
+        self._callbacks[self._key(labels)] = func
+
+    def _samples(self) -> List[str]:
+        samples = []
+        for key, func in sorted(self._callbacks.items()):
+            samples.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(func()))}")
+        return samples
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+
+        samples = []
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                samples.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+            samples.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return samples
+
+
+class MetricsRegistry:
+    """In-process metric families rendered in OpenMetrics text format"""
+
+    def __init__(self, namespace: str = ''):
+        self.namespace = namespace
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self._full_name(name), documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self._full_name(name), documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self._full_name(name), documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int,
+                         host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread; call .shutdown() to stop"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every second would flood the terminal
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+class SecurityMetrics:
+    """
+    The SecurityMediator's metric families
+    Throughput counters, latency histograms per layer and per verdict,
+    and cache hit ratios
+    """
+
+    def __init__(self, namespace: str = 'secure_browser'):
+        self.registry = MetricsRegistry(namespace)
+
+        self.pages_analyzed = self.registry.counter(
+            'pages_analyzed', 'Pages analyzed, by verdict', ['action'])
+        self.threats_detected = self.registry.counter(
+            'threats_detected', 'Pages with a BLOCK or CONFIRM verdict')
+        self.actions_blocked = self.registry.counter(
+            'actions_blocked', 'Pages with a BLOCK verdict')
+        self.llm_calls = self.registry.counter(
+            'llm_calls', 'LLM reasoning requests (including response-cache hits), by kind', ['kind'])
+        self.degraded_verdicts = self.registry.counter(
+            'degraded_verdicts', 'Verdicts given without the LLM because the latency budget ran out')
+
+        self.analysis_latency = self.registry.histogram(
+            'analysis_latency_seconds', 'End-to-end page analysis latency, by verdict', ['action'])
+        self.layer_latency = self.registry.histogram(
+            'layer_latency_seconds', 'Latency per security layer', ['layer'])
+        self.stage_latency = self.registry.histogram(
+            'stage_latency_seconds', 'Latency per analysis stage', ['stage'])
+
+        self.cache_hit_ratio = self.registry.gauge(
+            'cache_hit_ratio', 'Hit ratio per cache', ['cache'])
+
+        self._server = None
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['SecurityMetrics']:
+        """Build from the metrics block of config.yaml; None when disabled"""
+        settings = config.get('metrics') or {}
+        if not settings.get('enabled', True):
+            return None
+
+        metrics = cls(settings.get('namespace', 'secure_browser'))
+        if settings.get('http_port'):
+            metrics.serve(settings['http_port'], settings.get('http_host', '127.0.0.1'))
+        return metrics
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        """Expose /metrics over HTTP"""
+        if self._server is None:
+            self._server = start_metrics_server(self.registry, port, host)
+        return self._server
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def track_cache(self, name: str, get_stats: Callable[[], Dict]):
+        self.cache_hit_ratio.set_function(lambda: get_stats().get('hit_ratio', 0.0), cache=name)
+
+    def observe_analysis(self, action: str, latency_ms: float,
+                         layers: Dict[str, float], stages: Dict[str, float]):
+        self.pages_analyzed.inc(action=action)
+        if action in ('BLOCK', 'CONFIRM'):
+            self.threats_detected.inc()
+        if action == 'BLOCK':
+            self.actions_blocked.inc()
+
+        self.analysis_latency.observe(latency_ms / 1000, action=action)
+        for layer, duration_ms in layers.items():
+            self.layer_latency.observe(duration_ms / 1000, layer=layer)
+        for stage, duration_ms in stages.items():
+            self.stage_latency.observe(duration_ms / 1000, stage=stage)
+
+    def observe_llm_call(self, kind: str):
+        self.llm_calls.inc(kind=kind)
+
+    def observe_degraded(self):
+        self.degraded_verdicts.inc()
+
+    def render(self) -> str:
+        return self.registry.render()
@@ -1,37 +1,103 @@
+import threading
 import time
-from typing import Dict, List
-from collections import deque
-import statistics
+from contextlib import contextmanager
+from typing import Callable, Dict
+from .quantile_sketch import QuantileSketch
+
+
+class StageTimer:
+    """
+    Named wall-clock spans for a single analysis
+    Spans keep the order they were first opened; re-opening one adds to it
+    """
+
+    def __init__(self):
+        self.spans: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed_ms
+
+    def run(self, name: str, func: Callable, *args, **kwargs):
+        """Call func inside a span and return its result"""
+        with self.span(name):
+            return func(*args, **kwargs)
+
+    def as_dict(self, digits: int = 3) -> Dict[str, float]:
+        return {name: round(ms, digits) for name, ms in self.spans.items()}
+
 
 class PerformanceMonitor:
     """
     Track performance metrics for the security layer
     Critical for Performance and Latency scoring
     """
+
+    # Stage spans (by name prefix) rolled up into the per-layer series
+    LAYER_ROLLUP = (
+        ('parse', 'dom_analysis'),
+        ('dom.', 'dom_analysis'),
+        ('nlp.', 'nlp_classification'),
+        ('llm', 'llm_reasoning'),
+    )
     
-    def __init__(self, window_size: int = 100):
-        self.window_size = window_size
-        self.latencies = deque(maxlen=window_size)
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        # Sketches instead of sample windows: constant memory for any number
+        # of samples, O(1) recording and no sort per statistics call
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._lock = threading.Lock()
+        self.latencies = self._new_sketch()
         self.layer_timings = {
-            'dom_analysis': deque(maxlen=window_size),
-            'nlp_classification': deque(maxlen=window_size),
-            'llm_reasoning': deque(maxlen=window_size),
-            'total': deque(maxlen=window_size)
+            'dom_analysis': self._new_sketch(),
+            'nlp_classification': self._new_sketch(),
+            'llm_reasoning': self._new_sketch(),
+            'total': self._new_sketch()
         }
-        
+
+    def _new_sketch(self) -> QuantileSketch:
+        return QuantileSketch(self.relative_accuracy, self.max_bins)
+
     def record_analysis(self, latency_ms: float):
         """Record overall analysis latency"""
-        self.latencies.append(latency_ms)
-        self.layer_timings['total'].append(latency_ms)
-    
+        with self._lock:
+            self.latencies.add(latency_ms)
+            self.layer_timings['total'].add(latency_ms)
+
     def record_layer_timing(self, layer: str, duration_ms: float):
-        """Record timing for specific layer"""
-        if layer in self.layer_timings:
-            self.layer_timings[layer].append(duration_ms)
-    
+        """Record timing for specific layer (or stage span)"""
+        with self._lock:
+            if layer not in self.layer_timings:
+                self.layer_timings[layer] = self._new_sketch()
+            self.layer_timings[layer].add(duration_ms)
+
+    def record_spans(self, spans: Dict[str, float]):
+        """Record every stage span of one analysis, plus its per-layer totals"""
+        for name, duration_ms in spans.items():
+            self.record_layer_timing(name, duration_ms)
+
+        for layer, duration_ms in self.rollup(spans).items():
+            self.record_layer_timing(layer, duration_ms)
+
+    @classmethod
+    def rollup(cls, spans: Dict[str, float]) -> Dict[str, float]:
+        """Sum stage spans into dom_analysis / nlp_classification / llm_reasoning"""
+        totals = {}
+        for name, duration_ms in spans.items():
+            for prefix, layer in cls.LAYER_ROLLUP:
+                if name.startswith(prefix):
+                    totals[layer] = totals.get(layer, 0.0) + duration_ms
+                    break
+        return totals
+
     def get_statistics(self) -> Dict:
         """Get performance statistics"""
-        if not self.latencies:
+        if not self.latencies.count:
             return {
                 'average_latency_ms': 0.0,
                 'median_latency_ms': 0.0,
@@ -40,38 +106,62 @@ class PerformanceMonitor:
                 'min_latency_ms': 0.0,
                 'max_latency_ms': 0.0
             }
-        
-        latencies_list = list(self.latencies)
-        
+
+        sketch = self.latencies
+        median, p95, p99 = sketch.quantiles([0.50, 0.95, 0.99])
+
         return {
-            'average_latency_ms': round(statistics.mean(latencies_list), 2),
-            'median_latency_ms': round(statistics.median(latencies_list), 2),
-            'p95_latency_ms': round(self._percentile(latencies_list, 0.95), 2),
-            'p99_latency_ms': round(self._percentile(latencies_list, 0.99), 2),
-            'min_latency_ms': round(min(latencies_list), 2),
-            'max_latency_ms': round(max(latencies_list), 2),
-            'total_measurements': len(latencies_list)
+            'average_latency_ms': round(sketch.mean, 2),
+            'median_latency_ms': round(median, 2),
+            'p95_latency_ms': round(p95, 2),
+            'p99_latency_ms': round(p99, 2),
+            'min_latency_ms': round(sketch.min, 2),
+            'max_latency_ms': round(sketch.max, 2),
+            'total_measurements': sketch.count
         }
-    
+
     def get_layer_breakdown(self) -> Dict:
         """Get timing breakdown by layer"""
         breakdown = {}
-        
-        for layer, timings in self.layer_timings.items():
-            if timings:
+
+        for layer, sketch in list(self.layer_timings.items()):
+            if sketch.count:
+                median, p95 = sketch.quantiles([0.50, 0.95])
                 breakdown[layer] = {
-                    'average_ms': round(statistics.mean(timings), 2),
-                    'median_ms': round(statistics.median(timings), 2)
+                    'average_ms': round(sketch.mean, 2),
+                    'median_ms': round(median, 2),
+                    'p95_ms': round(p95, 2)
                 }
-        
+
         return breakdown
-    
-    def _percentile(self, data: List[float], percentile: float) -> float:
-        """Calculate percentile value"""
-        sorted_data = sorted(data)
-        index = int(len(sorted_data) * percentile)
-        return sorted_data[min(index, len(sorted_data) - 1)]
-    
+
+    def merge(self, other: 'PerformanceMonitor'):
+        """Fold in the measurements of another monitor (e.g. a worker process)"""
+        with self._lock:
+            self.latencies.merge(other.latencies)
+            for layer, sketch in other.layer_timings.items():
+                if layer not in self.layer_timings:
+                    self.layer_timings[layer] = self._new_sketch()
+                self.layer_timings[layer].merge(sketch)
+
+    def to_dict(self) -> Dict:
+        """Serializable snapshot of every sketch, for merging elsewhere"""
+        with self._lock:
+            return {
+                'latencies': self.latencies.to_dict(),
+                'layer_timings': {layer: sketch.to_dict() for layer, sketch in self.layer_timings.items()}
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PerformanceMonitor':
+        latencies = QuantileSketch.from_dict(data['latencies'])
+        monitor = cls(latencies.relative_accuracy, latencies.max_bins)
+        monitor.latencies = latencies
+        monitor.layer_timings.update(
+            (layer, QuantileSketch.from_dict(sketch)) for layer, sketch in data['layer_timings'].items()
+        )
+        return monitor
+
     def is_meeting_sla(self, sla_ms: float = 500) -> bool:
         """Check if performance meets SLA"""
         stats = self.get_statistics()
@@ -0,0 +1,161 @@
+import math
+from typing import Dict, List, Sequence
+
+
+class QuantileSketch:
+    """
+    Constant-memory, mergeable quantile sketch (DDSketch)
+
+    Values land in logarithmic buckets, so every quantile estimate is within
+    relative_accuracy of the true value. Recording is O(1), queries walk at
+    most max_bins counters, and sketches from different processes merge by
+    adding bucket counts. Built for non-negative values such as latencies.
+    """
+
+    # Values at or below this are counted as zero (buckets start just above it)
+    MIN_INDEXABLE = 1e-6
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+        # Dense bucket counts; self._bins[i] holds bucket self._offset + i
+        self._bins: List[int] = []
+        self._offset = 0
+        self._zero_count = 0
+
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: int = 1):
+        """Record a value"""
+        value = float(value) if value > 0 else 0.0
+
+        self.count += weight
+        self.sum += value * weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if value <= self.MIN_INDEXABLE:
+            self._zero_count += weight
+            return
+
+        slot = self._slot(math.ceil(math.log(value) / self._log_gamma))
+        self._bins[slot] += weight
+
+    def _slot(self, key: int) -> int:
+        """Position of a bucket in the dense store, growing it as needed"""
+        if not self._bins:
+            self._bins = [0]
+            self._offset = key
+            return 0
+
+        if key < self._offset:
+            if self._offset + len(self._bins) - key > self.max_bins:
+                # Out of room - the lowest buckets absorb anything smaller
+                return 0
+            self._bins[:0] = [0] * (self._offset - key)
+            self._offset = key
+        elif key >= self._offset + len(self._bins):
+            self._bins.extend([0] * (key - self._offset - len(self._bins) + 1))
+            self._collapse()
+
+        return key - self._offset
+
+    def _collapse(self):
+        """Fold the lowest buckets together so at most max_bins remain"""
+        excess = len(self._bins) - self.max_bins
+        if excess > 0:
+            folded = sum(self._bins[:excess + 1])
+            self._bins = [folded] + self._bins[excess + 1:]
+            self._offset += excess
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile q (0..1); 0.0 when empty"""
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """Several quantiles in one pass over the buckets"""
+        if self.count == 0:
+            return [0.0 for _ in qs]
+
+        # Nearest rank, same rule as the old sorted-window percentile
+        ranks = sorted((min(int(self.count * q), self.count - 1), i) for i, q in enumerate(qs))
+        results = [0.0] * len(qs)
+
+        position = 0
+        cumulative = self._zero_count
+        key = self._offset - 1
+        for rank, i in ranks:
+            while cumulative <= rank and position < len(self._bins):
+                cumulative += self._bins[position]
+                position += 1
+                key += 1
+
+            if rank < self._zero_count:
+                value = 0.0
+            else:
+                value = 2 * self._gamma ** key / (self._gamma + 1)
+            results[i] = min(max(value, self.min), self.max)
+
+        return results
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def merge(self, other: 'QuantileSketch'):
+        """Fold another sketch (same relative_accuracy) into this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative_accuracy")
+
+        if other.count == 0:
+            return
+
+        for i, bucket_count in enumerate(other._bins):
+            if bucket_count:
+                slot = self._slot(other._offset + i)
+                self._bins[slot] += bucket_count
+
+        self._zero_count += other._zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> Dict:
+        """JSON-safe snapshot, e.g. for shipping from a worker process"""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'offset': self._offset,
+            'bins': list(self._bins),
+            'zero_count': self._zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'], data.get('max_bins', 2048))
+        sketch._offset = data['offset']
+        sketch._bins = list(data['bins'])
+        sketch._zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        if sketch.count:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
@@ -0,0 +1,299 @@
+import json
+from typing import AsyncIterable, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+
+class ResponseParseError(ValueError):
+    """The LLM reply held no usable JSON, or a field broke the schema"""
+
+
+class ResponseSchema:
+    """
+    Expected fields of a JSON reply
+
+    fields maps a name to the accepted Python type(s); choices lists the
+    allowed values of string fields (matched case-insensitively, stored
+    lowercased). A streamed reply is read only until every decisive field
+    is in, plus the fields dependent lists for the value a decisive field
+    took.
+    """
+
+    def __init__(self, fields: Dict[str, Union[type, Tuple[type, ...]]],
+                 decisive: Sequence[str] = (), required: Optional[Sequence[str]] = None,
+                 choices: Optional[Dict[str, Sequence[str]]] = None,
+                 dependent: Optional[Dict[str, Dict[str, Sequence[str]]]] = None):
+        self.fields = fields
+        self.decisive = tuple(decisive)
+        self.required = tuple(required) if required is not None else self.decisive
+        self.choices = {name: {choice.lower() for choice in values} for name, values in (choices or {}).items()}
+        self.dependent = dependent or {}
+
+    def check(self, name: str, value):
+        """Validate one field as soon as it is parsed; returns the stored value"""
+        expected = self.fields.get(name)
+        if expected is None:
+            # Extra fields are kept as they are
+            return value
+
+        # bool is an int subclass - don't let true pass as a confidence
+        if not isinstance(value, expected) or (isinstance(value, bool) and bool not in _as_tuple(expected)):
+            raise ResponseParseError(f"Field {name!r} has the wrong type: {value!r}")
+
+        if name in self.choices:
+            value = value.strip().lower()
+            if value not in self.choices[name]:
+                raise ResponseParseError(f"Field {name!r} has an unexpected value: {value!r}")
+
+        return value
+
+    def decided(self, fields: Dict) -> bool:
+        if not all(name in fields for name in self.decisive):
+            return False
+
+        for name, needs in self.dependent.items():
+            for extra in needs.get(fields.get(name), ()):
+                if extra not in fields:
+                    return False
+        return True
+
+    def complete(self, fields: Dict) -> bool:
+        """Every field of the schema is present (worth caching)"""
+        return all(name in fields for name in self.fields)
+
+    def finish(self, fields: Dict) -> Dict:
+        missing = [name for name in self.required if name not in fields]
+        if missing:
+            raise ResponseParseError(f"Reply is missing required fields: {', '.join(missing)}")
+        return fields
+
+    def validate(self, obj) -> Dict:
+        """Check an already-decoded object (e.g. one entry of a JSON array)"""
+        if not isinstance(obj, dict):
+            raise ResponseParseError(f"Expected a JSON object, got {type(obj).__name__}")
+        return self.finish({name: self.check(name, value) for name, value in obj.items()})
+
+
+def _as_tuple(types) -> Tuple[type, ...]:
+    return types if isinstance(types, tuple) else (types,)
+
+
+INTENT_SCHEMA = ResponseSchema(
+    fields={
+        'is_malicious': bool,
+        'confidence': (int, float),
+        'threat_type': str,
+        'reasoning': str,
+        'recommended_action': str,
+    },
+    # The verdict is scored and explained with all of its fields - read it to the end
+    decisive=('is_malicious', 'confidence', 'threat_type', 'reasoning', 'recommended_action'),
+    required=('is_malicious', 'recommended_action'),
+    choices={'recommended_action': ('block', 'warn', 'allow')},
+)
+
+ACTION_VALIDATION_SCHEMA = ResponseSchema(
+    fields={
+        'is_safe': bool,
+        'risk_level': str,
+        'concerns': list,
+        'recommendation': str,
+    },
+    decisive=('is_safe', 'risk_level', 'concerns', 'recommendation'),
+    required=('is_safe', 'recommendation'),
+    choices={'recommendation': ('proceed', 'confirm', 'block')},
+)
+
+AGENT_ACTION_SCHEMA = ResponseSchema(
+    fields={
+        'action_type': str,
+        'selector': (str, type(None)),
+        'value': (str, type(None)),
+        'reasoning': str,
+    },
+    decisive=('action_type', 'selector'),
+    required=('action_type',),
+    choices={'action_type': ('click', 'fill', 'navigate', 'submit', 'none')},
+    # The text to type / the URL is needed before the plan can run
+    dependent={'action_type': {'fill': ('value',), 'navigate': ('value',)}},
+)
+
+
+class IncrementalJSONParser:
+    """
+    Pulls the first JSON value out of an LLM reply as it streams in
+
+    Prose, markdown fences and brace-looking text before the JSON are
+    skipped. With a schema only an object is accepted: each top-level field
+    is decoded and checked the moment its value ends. With stop_early,
+    feed() reports done once the schema's decisive fields are in - the rest
+    of the stream need not be read; otherwise the object is read to its
+    closing brace. Without a schema the first complete object or array is
+    returned as is. Every character is scanned once.
+    """
+
+    def __init__(self, schema: Optional[ResponseSchema] = None, stop_early: bool = False):
+        self.schema = schema
+        self.stop_early = stop_early
+        self.done = False
+
+        self._buffer = ''
+        self._pos = 0
+        self._value = None
+        self._reset()
+
+    def _reset(self):
+        self._start: Optional[int] = None
+        self._kind = '{'
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # Position inside the top-level object: key, in_key, colon, value_start, value
+        self._member = 'key'
+        self._key_start = 0
+        self._key = None
+        self._value_start = 0
+        self._fields: Dict = {}
+
+    def feed(self, text: str) -> bool:
+        """Add the next piece of the reply; True once the result is settled"""
+        if self.done or not text:
+            return self.done
+
+        self._buffer += text
+        self._scan()
+        return self.done
+
+    def _scan(self):
+        buffer = self._buffer
+        i = self._pos
+
+        while i < len(buffer) and not self.done:
+            c = buffer[i]
+            i += 1
+
+            if self._start is None:
+                if c == '{' or (c == '[' and self.schema is None):
+                    self._start = i - 1
+                    self._depth = 1
+                    self._kind = c
+                continue
+
+            try:
+                self._step(c, i)
+            except ResponseParseError:
+                # A well-formed field that breaks the schema - the reply is unusable
+                raise
+            except ValueError:
+                # Not JSON after all (prose such as "{see below}") - look again after its opening brace
+                i = self._start + 1
+                self._reset()
+
+        self._pos = i
+
+    def _step(self, c: str, i: int):
+        """Advance over c; i is the index just past it"""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == '\\':
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._member == 'in_key':
+                    self._key = json.loads(self._buffer[self._key_start:i])
+                    self._member = 'colon'
+            return
+
+        if self._kind == '{' and self._depth == 1 and self._member != 'value':
+            if c.isspace():
+                return
+            if self._member == 'key':
+                if c == '"':
+                    self._in_string = True
+                    self._key_start = i - 1
+                    self._member = 'in_key'
+                elif c == '}':
+                    self._depth = 0
+                    self._close(i)
+                else:
+                    raise ValueError("Expected a key")
+                return
+            if self._member == 'colon':
+                if c != ':':
+                    raise ValueError("Expected ':'")
+                self._member = 'value_start'
+                return
+            # First character of a value - handled below like any other
+            self._value_start = i - 1
+            self._member = 'value'
+
+        if c == '"':
+            self._in_string = True
+        elif c in '{[':
+            self._depth += 1
+        elif c in '}]':
+            if self._kind == '{' and self._depth == 1:
+                self._end_member(i - 1)
+            self._depth -= 1
+            if self._depth == 0 and not self.done:
+                self._close(i)
+        elif c == ',' and self._kind == '{' and self._depth == 1:
+            self._end_member(i - 1)
+            self._member = 'key'
+
+    def _end_member(self, end: int):
+        text = self._buffer[self._value_start:end].strip()
+        value = json.loads(text)
+        if self.schema is not None:
+            value = self.schema.check(self._key, value)
+        self._fields[self._key] = value
+
+        if self.stop_early and self.schema is not None and self.schema.decided(self._fields):
+            self.done = True
+
+    def _close(self, end: int):
+        if self.schema is None:
+            # Objects are assembled from their members, which also forgives a trailing comma
+            self._value = self._fields if self._kind == '{' else json.loads(self._buffer[self._start:end])
+        self.done = True
+
+    def result(self):
+        """The parsed reply; raises ResponseParseError if it is not usable"""
+        if self.schema is not None:
+            if self._start is None:
+                raise ResponseParseError("No JSON object in the reply")
+            if not self.done and self._member == 'value' and self._depth == 1 and not self._in_string:
+                # The stream ended right after the last value, before its '}'
+                try:
+                    self._end_member(len(self._buffer))
+                except json.JSONDecodeError:
+                    pass
+            # A reply cut off after the required fields is still usable
+            return self.schema.finish(dict(self._fields))
+
+        if self._value is None:
+            raise ResponseParseError("No complete JSON value in the reply")
+        return self._value
+
+
+def parse_response(text: str, schema: Optional[ResponseSchema] = None):
+    """Parse a complete reply (every field of the object is kept)"""
+    parser = IncrementalJSONParser(schema)
+    parser.feed(text)
+    return parser.result()
+
+
+def parse_stream(chunks: Iterable[str], schema: Optional[ResponseSchema] = None):
+    """Parse a streamed reply, reading only as many chunks as the schema's decisive fields need"""
+    parser = IncrementalJSONParser(schema, stop_early=True)
+    for chunk in chunks:
+        if parser.feed(chunk):
+            break
+    return parser.result()
+
+
+async def parse_stream_async(chunks: AsyncIterable[str], schema: Optional[ResponseSchema] = None):
+    parser = IncrementalJSONParser(schema, stop_early=True)
+    async for chunk in chunks:
+        if parser.feed(chunk):
+            break
+    return parser.result()
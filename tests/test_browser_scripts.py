@@ -0,0 +1,55 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from analyzers.style_resolver import hiding_method
+from core.browser_scripts import _HIDING_METHOD_JS
+
+NODE = shutil.which('node')
+
+# Computed styles as a browser reports them (lengths already in px)
+DEFAULTS = {'display': 'block', 'visibility': 'visible', 'opacity': '1', 'font-size': '16px',
+            'text-indent': '0px', 'position': 'static', 'left': 'auto', 'top': 'auto'}
+
+CASES = [
+    {},
+    {'display': 'none'},
+    {'visibility': 'hidden'},
+    {'visibility': 'collapse'},
+    {'opacity': '0'},
+    {'opacity': '0.5'},
+    {'font-size': '0px'},
+    {'font-size': '1px'},
+    {'font-size': '1.5px'},
+    {'text-indent': '-9999px'},
+    {'text-indent': '-999px'},
+    {'text-indent': '-998px'},
+    {'position': 'absolute'},
+    {'position': 'absolute', 'left': '10px'},
+    {'position': 'absolute', 'left': '-9999px'},
+    {'position': 'fixed', 'top': '-2000px'},
+    {'position': 'relative', 'left': '-9999px'},
+    {'position': 'static', 'top': '-9999px'},
+    {'position': 'absolute', 'left': '-500px', 'top': '-500px'},
+    {'display': 'none', 'opacity': '0'},
+    {'opacity': '0', 'font-size': '0px'},
+]
+
+
+def js_methods(styles):
+    """hidingMethod from the injected scripts, run in node over fake computed styles"""
+    camel = [{''.join(part.title() if i else part for i, part in enumerate(name.split('-'))): value
+              for name, value in style.items()} for style in styles]
+    script = ('const getComputedStyle = (element) => element;' + _HIDING_METHOD_JS
+              + f'console.log(JSON.stringify({json.dumps(camel)}.map(hidingMethod)));')
+    output = subprocess.run([NODE, '-e', script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+@pytest.mark.skipif(NODE is None, reason='node is not installed')
+def test_browser_hiding_rules_match_hiding_method():
+    styles = [dict(DEFAULTS, **case) for case in CASES]
+
+    assert js_methods(styles) == [hiding_method(style) for style in styles]
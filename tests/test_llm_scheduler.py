@@ -0,0 +1,177 @@
+import threading
+import time
+
+import pytest
+
+from analyzers.llm_reasoner import LLMThreatReasoner
+from analyzers.llm_scheduler import LLMDeadlineExceeded, LLMRequestScheduler
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class GatedClient:
+    """Answers every prompt with {}; prompts starting with 'hold' wait for release"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls.append((prompt, request_options))
+        if prompt.startswith('hold'):
+            self.release.wait(5)
+        return Response('{"prompt": "%s"}' % prompt)
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = LLMRequestScheduler(max_concurrency=1)
+    yield scheduler
+    scheduler.close()
+
+
+def test_joined_caller_keeps_its_own_budget(scheduler):
+    client = GatedClient()
+    reasoner = LLMThreatReasoner(client=client, scheduler=scheduler)
+    # Occupies the only slot, so 'shared' stays queued
+    blocker = threading.Thread(target=reasoner._generate_json, args=('hold',))
+    blocker.start()
+    wait_until(lambda: client.calls)
+
+    results = {}
+
+    def hurried():
+        try:
+            reasoner._generate_json('shared', timeout=0.05)
+        except LLMDeadlineExceeded as e:
+            results['hurried'] = e
+
+    def patient():
+        results['patient'] = reasoner._generate_json('shared')
+
+    with_budget = threading.Thread(target=hurried)
+    with_budget.start()
+    wait_until(lambda: scheduler.get_stats()['submitted'] == 2)
+    without_budget = threading.Thread(target=patient)
+    without_budget.start()
+    with_budget.join()
+
+    client.release.set()
+    without_budget.join(5)
+    blocker.join(5)
+
+    # The hurried caller gave up; the one without a budget still gets the
+    # answer, from a call made without a timeout
+    assert isinstance(results['hurried'], LLMDeadlineExceeded)
+    assert results['patient'] == {'prompt': 'shared'}
+    assert ('shared', None) in client.calls
+    assert scheduler.get_stats()['sent'] == 2
+
+
+def test_widest_deadline_is_sent(scheduler):
+    client = GatedClient()
+    reasoner = LLMThreatReasoner(client=client, scheduler=scheduler)
+    blocker = threading.Thread(target=reasoner._generate_json, args=('hold',))
+    blocker.start()
+    wait_until(lambda: client.calls)
+
+    callers = [threading.Thread(target=lambda t=t: reasoner._generate_json('shared', timeout=t))
+               for t in (0.5, 3.0)]
+    for caller in callers:
+        caller.start()
+    wait_until(lambda: scheduler.get_stats()['submitted'] == 3)
+    client.release.set()
+    for caller in callers + [blocker]:
+        caller.join(5)
+
+    timeout = dict(client.calls)['shared']['timeout']
+    assert 2.0 < timeout <= 3.0
+
+
+def test_urgent_caller_raises_the_priority_of_a_queued_job(scheduler):
+    gate = threading.Event()
+    order = []
+
+    def call(name):
+        def run(deadline):
+            if name == 'blocker':
+                gate.wait(5)
+            order.append(name)
+            return name
+        return run
+
+    blocker = scheduler.submit('blocker', call('blocker'))
+    wait_until(lambda: scheduler.get_stats()['sent'] == 1)
+    scan = scheduler.submit('scan', call('scan'), LLMRequestScheduler.PRIORITY_SCAN)
+    shared = scheduler.submit('shared', call('shared'), LLMRequestScheduler.PRIORITY_SCAN)
+    # An action validation joins the queued 'shared' request
+    joined = scheduler.submit('shared', call('shared'), LLMRequestScheduler.PRIORITY_ACTION)
+    assert joined is shared
+
+    gate.set()
+    for future in (blocker, scan, shared):
+        future.result(5)
+
+    assert order == ['blocker', 'shared', 'scan']
+    assert scheduler.get_stats()['sent'] == 3
+
+
+def test_abandoned_queued_job_is_never_sent(scheduler):
+    gate = threading.Event()
+    sent = []
+
+    def call(name):
+        def run(deadline):
+            if name == 'blocker':
+                gate.wait(5)
+            sent.append(name)
+            return name
+        return run
+
+    blocker = scheduler.submit('blocker', call('blocker'))
+    wait_until(lambda: scheduler.get_stats()['sent'] == 1)
+    queued = scheduler.submit('queued', call('queued'))
+    scheduler.abandon('queued', queued)
+
+    gate.set()
+    blocker.result(5)
+    wait_until(lambda: queued.cancelled())
+
+    assert sent == ['blocker']
+
+
+def test_job_abandoned_while_waiting_for_a_slot_is_never_sent(scheduler):
+    gate = threading.Event()
+    sent = []
+
+    def call(name):
+        def run(deadline):
+            if name == 'blocker':
+                gate.wait(5)
+            sent.append(name)
+            return name
+        return run
+
+    # The dispatcher blocks on the busy slot for the whole wait
+    scheduler.POLL_SECONDS = 5
+    blocker = scheduler.submit('blocker', call('blocker'))
+    wait_until(lambda: scheduler.get_stats()['sent'] == 1)
+    queued = scheduler.submit('queued', call('queued'))
+    wait_until(lambda: scheduler.get_stats()['queued'] == 0)
+    scheduler.abandon('queued', queued)
+
+    gate.set()
+    blocker.result(5)
+    wait_until(lambda: queued.cancelled())
+
+    assert sent == ['blocker']
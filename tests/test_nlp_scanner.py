@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from analyzers.nlp_classifier import NLPThreatClassifier
+
+WORDS = [
+    'ignore', 'IGNORE', 'Ignore', 'all', 'previous', 'instructions', 'instruction',
+    'disregard', 'forget', 'system', 'SYSTEM', ':', '[SYSTEM]', '<|system|>', 'assistant',
+    'new', 'your', 'real', 'task', 'goal', 'is', 'instead', 'of', 'reading', ',', 'you',
+    'should', 'do', 'not', 'stop', 'are', 'now', 'a', 'an', 'act', 'as', 'pretend', 'to',
+    'be', 'developer', 'god', 'mode', 'unrestricted', 'bypass', 'rules', 'send', 'password',
+    'submit', 'https://x.test', 'transfer', 'funds', 'navigate', 'click', 'here', 'win',
+    'won', 'winner', 'account', 'locked', 'verify', 'identity', 'urgent', 'action',
+    'required', 'İ', 'ſ', 'ß', 'é', 'ﬁ', 'ignoreignore', 'sys', 'tem',
+]
+
+
+def random_text(rng, words):
+    return ''.join(rng.choice(WORDS) + rng.choice([' ', ' ', '  ', '\n', '', ': ', ', '])
+                   for _ in range(words))
+
+
+def findall_by_category(classifier, text):
+    """What one re.findall per pattern gives, per category"""
+    matches = {}
+    for category, patterns in classifier.compiled_patterns.items():
+        for pattern in patterns:
+            found = pattern.findall(text)
+            if found:
+                matches.setdefault(category, []).extend(found)
+    return matches
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    return NLPThreatClassifier()
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_scan_equals_findall_per_pattern(classifier, seed):
+    rng = random.Random(seed)
+    text = random_text(rng, rng.randrange(1, 200))
+
+    assert classifier.scan(text) == findall_by_category(classifier, text)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_scan_of_a_window_reports_only_matches_starting_in_it(classifier, seed):
+    rng = random.Random(seed)
+    text = random_text(rng, 150)
+    start = rng.randrange(len(text))
+    end = rng.randrange(start, len(text) + 1)
+
+    expected = {}
+    for category, pattern in classifier.pattern_index:
+        for match in pattern.finditer(text):
+            if start <= match.start() < end:
+                expected.setdefault(category, []).append(classifier._findall_value(match))
+
+    assert classifier.scan(text, start, end) == expected
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_combined_regex_fallback_equals_findall(classifier, monkeypatch, seed):
+    # Taken when the lowercased text would not line up with the original
+    monkeypatch.setattr(classifier, '_fold_case', lambda text: None)
+    rng = random.Random(seed)
+    text = random_text(rng, 100)
+
+    assert classifier.scan(text) == findall_by_category(classifier, text)
+
+
+def test_case_folding_keeps_offsets(classifier):
+    text = 'İGNORE ALL INSTRUCTIONS, ſystem: ok'
+
+    assert len(classifier._fold_case(text)) == len(text)
+    assert classifier.scan(text) == findall_by_category(classifier, text)
+
+
+def test_literal_prefixes(classifier):
+    assert classifier._literal_prefix(r'ignore\s+(previous|all)') == 'ignore'
+    assert classifier._literal_prefix(r'<\|system\|>') == '<|system|>'
+    assert classifier._literal_prefix(r'\[SYSTEM\]') == '[SYSTEM]'
+    assert classifier._literal_prefix(r'instructions?') == 'instruction'
@@ -0,0 +1,91 @@
+import json
+import random
+
+import pytest
+
+from utils.quantile_sketch import QuantileSketch
+
+QUANTILES = [0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999, 1.0]
+
+DISTRIBUTIONS = {
+    'lognormal': lambda rng: rng.lognormvariate(3, 1.5),
+    'exponential': lambda rng: rng.expovariate(1 / 40),
+    'uniform': lambda rng: rng.uniform(0.5, 500),
+    'bimodal': lambda rng: rng.gauss(5, 1) if rng.random() < 0.9 else rng.gauss(900, 50),
+    'with_zeros': lambda rng: 0.0 if rng.random() < 0.2 else rng.paretovariate(1.2),
+}
+
+
+def exact(values, q):
+    """Nearest rank, as PerformanceMonitor reported before the sketches"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def assert_accurate(sketch, values):
+    accuracy = sketch.relative_accuracy
+    for q, estimate in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+        true = max(exact(values, q), 0.0)
+        assert abs(estimate - true) <= accuracy * true + 1e-9, (q, estimate, true)
+
+
+@pytest.mark.parametrize('name', DISTRIBUTIONS)
+@pytest.mark.parametrize('seed', range(5))
+def test_quantiles_within_relative_accuracy(name, seed):
+    rng = random.Random(seed)
+    values = [DISTRIBUTIONS[name](rng) for _ in range(20_000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    assert_accurate(sketch, values)
+    assert sketch.count == len(values)
+    assert sketch.mean == pytest.approx(sum(max(v, 0.0) for v in values) / len(values))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_merged_sketches_are_as_accurate(seed):
+    rng = random.Random(seed)
+    parts = [[rng.lognormvariate(2, 1) for _ in range(rng.randrange(1, 5000))] for _ in range(4)]
+    merged = QuantileSketch()
+    for part in parts:
+        sketch = QuantileSketch()
+        for value in part:
+            sketch.add(value)
+        merged.merge(sketch)
+
+    assert_accurate(merged, [value for part in parts for value in part])
+
+
+def test_round_trip_through_json():
+    rng = random.Random(0)
+    sketch = QuantileSketch()
+    for _ in range(1000):
+        sketch.add(rng.expovariate(0.1))
+
+    copy = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+
+    assert copy.quantiles(QUANTILES) == sketch.quantiles(QUANTILES)
+    assert (copy.count, copy.sum, copy.min, copy.max) == (sketch.count, sketch.sum, sketch.min, sketch.max)
+
+
+def test_memory_is_capped_and_high_quantiles_stay_accurate():
+    rng = random.Random(0)
+    values = [10 ** rng.uniform(-3, 6) for _ in range(20_000)]
+    sketch = QuantileSketch(relative_accuracy=0.01, max_bins=256)
+    for value in values:
+        sketch.add(value)
+
+    assert len(sketch._bins) <= 256
+    # Collapsing folds the lowest buckets, so the tail is untouched
+    for q in (0.9, 0.95, 0.99):
+        true = exact(values, q)
+        assert abs(sketch.quantile(q) - true) <= 0.01 * true
+
+
+def test_empty_and_mismatched_sketches():
+    assert QuantileSketch().quantiles([0.5, 0.99]) == [0.0, 0.0]
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+    with pytest.raises(ValueError):
+        QuantileSketch(relative_accuracy=1.5)
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from utils.response_parser import (
+    ACTION_VALIDATION_SCHEMA, AGENT_ACTION_SCHEMA, INTENT_SCHEMA,
+    IncrementalJSONParser, ResponseParseError, parse_response, parse_stream, parse_stream_async,
+)
+
+TRICKY_STRINGS = ['', 'plain', 'with "quotes"', 'back\\slash', '{not: json}', '[1, 2', '}', ',', 'ünï ',
+                  'tab\there', '\\"', 'a\nb']
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(7 if depth < 3 else 5)
+    if kind == 0:
+        return rng.choice(TRICKY_STRINGS)
+    if kind == 1:
+        return rng.randint(-10 ** 6, 10 ** 6)
+    if kind == 2:
+        return rng.uniform(-1, 1)
+    if kind == 3:
+        return rng.choice([True, False])
+    if kind == 4:
+        return None
+    if kind == 5:
+        return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return random_object(rng, depth + 1)
+
+
+def random_object(rng, depth=0):
+    return {f'{rng.choice(TRICKY_STRINGS)}{i}': random_value(rng, depth) for i in range(rng.randrange(6))}
+
+
+def split(rng, text):
+    """text in random pieces, some of them empty"""
+    cuts = sorted(rng.randrange(len(text) + 1) for _ in range(rng.randrange(8)))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+PREAMBLES = ['', 'Sure! Here is the analysis:\n', '```json\n', 'Result {see below}: ', 'a } b { c ',
+             '{not json} then ']
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_streamed_object_equals_json_loads(seed):
+    rng = random.Random(seed)
+    obj = random_object(rng)
+    text = rng.choice(PREAMBLES) + json.dumps(obj, indent=rng.choice([None, 2])) + rng.choice(['', '\n```', ' {"x": 1}'])
+
+    parser = IncrementalJSONParser()
+    for piece in split(rng, text):
+        parser.feed(piece)
+
+    assert parser.done
+    assert parser.result() == obj
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_streamed_array_equals_json_loads(seed):
+    rng = random.Random(seed)
+    value = [random_value(rng) for _ in range(rng.randrange(5))]
+
+    assert parse_stream(split(rng, 'Pages:\n' + json.dumps(value))) == value
+
+
+def test_reply_without_json_is_an_error():
+    with pytest.raises(ResponseParseError):
+        parse_response('I cannot help with that {really}.')
+    with pytest.raises(ResponseParseError):
+        parse_response('no braces', INTENT_SCHEMA)
+
+
+INTENT = {
+    'is_malicious': True,
+    'confidence': 0.9,
+    'threat_type': 'prompt_injection',
+    'reasoning': 'Hidden text tells the agent to {ignore} its "instructions".',
+    'recommended_action': 'BLOCK',
+}
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_schema_reply_is_read_in_full(seed):
+    rng = random.Random(seed)
+    text = '```json\n' + json.dumps(INTENT, indent=2) + '\n```'
+
+    result = parse_stream(split(rng, text), INTENT_SCHEMA)
+
+    assert result == dict(INTENT, recommended_action='block')
+    assert INTENT_SCHEMA.complete(result)
+
+
+def test_cut_off_reply_keeps_required_fields_but_is_not_complete():
+    text = json.dumps({'is_malicious': True, 'recommended_action': 'block', 'confidence': 0.9,
+                       'threat_type': 'phishing', 'reasoning': 'Fake login form'})
+    cut = text[:text.index('"threat_type"')]
+
+    result = parse_response(cut, INTENT_SCHEMA)
+
+    assert result['is_malicious'] is True and result['recommended_action'] == 'block'
+    assert not INTENT_SCHEMA.complete(result)
+
+
+def test_cut_off_reply_without_required_fields_is_an_error():
+    with pytest.raises(ResponseParseError, match='recommended_action'):
+        parse_response('{"is_malicious": false, "confidence": 0.1', INTENT_SCHEMA)
+
+
+def test_reply_ending_before_the_closing_brace():
+    result = parse_response('{"is_safe": true, "recommendation": "proceed"', ACTION_VALIDATION_SCHEMA)
+
+    assert result == {'is_safe': True, 'recommendation': 'proceed'}
+
+
+@pytest.mark.parametrize('reply, message', [
+    ('{"is_malicious": "yes", "recommended_action": "block"}', 'wrong type'),
+    ('{"is_malicious": true, "confidence": true, "recommended_action": "block"}', 'wrong type'),
+    ('{"is_malicious": true, "recommended_action": "explode"}', 'unexpected value'),
+])
+def test_fields_breaking_the_schema_are_errors(reply, message):
+    with pytest.raises(ResponseParseError, match=message):
+        parse_response(reply, INTENT_SCHEMA)
+
+
+def test_schema_skips_arrays_and_non_json_braces():
+    text = 'Verdicts [1, 2] and {this} then {"is_safe": false, "risk_level": "high", ' \
+           '"concerns": ["a", "b"], "recommendation": "confirm"}'
+
+    assert parse_response(text, ACTION_VALIDATION_SCHEMA)['concerns'] == ['a', 'b']
+
+
+def chunks_read(chunks, schema):
+    """How many chunks parse_stream pulls before it has its answer"""
+    pulled = []
+
+    def source():
+        for chunk in chunks:
+            pulled.append(chunk)
+            yield chunk
+
+    return parse_stream(source(), schema), len(pulled)
+
+
+def test_streaming_stops_at_the_decisive_fields():
+    chunks = ['{"action_type": "click", ', '"selector": "#buy", ', '"reasoning": "long text', ' more"}']
+
+    result, read = chunks_read(chunks, AGENT_ACTION_SCHEMA)
+
+    assert result == {'action_type': 'click', 'selector': '#buy'}
+    assert read == 2
+
+
+def test_streaming_waits_for_dependent_fields():
+    chunks = ['{"action_type": "fill", ', '"selector": "#q", ', '"value": "shoes", ', '"reasoning": "x"}']
+
+    result, read = chunks_read(chunks, AGENT_ACTION_SCHEMA)
+
+    assert result['value'] == 'shoes'
+    assert read == 3
+
+
+def test_async_stream_matches_sync():
+    async def source():
+        for piece in split(random.Random(0), json.dumps(INTENT)):
+            yield piece
+
+    assert asyncio.run(parse_stream_async(source(), INTENT_SCHEMA)) == parse_response(json.dumps(INTENT), INTENT_SCHEMA)
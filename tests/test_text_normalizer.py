@@ -0,0 +1,113 @@
+import random
+import re
+
+import pytest
+
+from analyzers.nlp_classifier import NLPThreatClassifier
+from analyzers.text_normalizer import TextNormalizer
+
+# Phrases the patterns match, split and disguised below, plus filler
+FRAGMENTS = [
+    'ignore all instructions', 'IGNORE  previous\ninstruction', 'system: ', 'assistant :',
+    'instead of reading, you should', 'do not stop, instead', 'you are now a', 'act as an ',
+    'developer mode', 'bypass rules', 'send your password', 'navigate to https://x.test/a',
+    'submit to http://y.test', 'verify your account', 'urgent action required',
+    'click here to win', 'you won', '[SYSTEM]', '<|system|>', 'new instruction:',
+    'the', 'page', 'hello,', 'a', 'to', ',', 'ｉｇｎｏｒｅ', 'іgnore', 'é',
+    '¨', '​', '­', ' ', 'ﬁ', 'Ⅸ', '①', 'ß', 'İ', '　', '\t',
+]
+
+
+def random_text(rng, words):
+    parts = []
+    for _ in range(words):
+        fragment = rng.choice(FRAGMENTS)
+        if rng.random() < 0.2 and len(fragment) > 2:
+            cut = rng.randrange(1, len(fragment))
+            fragment = fragment[:cut] + rng.choice(['​', '­', '⁠']) + fragment[cut:]
+        parts.append(fragment)
+        parts.append(rng.choice([' ', ' ', '  ', '\n', ' ', '']))
+    return ''.join(parts)
+
+
+def whole_text_matches(classifier, normalized):
+    """Every findall match of every pattern: (category, start, end, value)"""
+    matches = set()
+    for category, pattern in classifier.pattern_index:
+        position = 0
+        while True:
+            match = pattern.search(normalized, position)
+            if match is None:
+                break
+            matches.add((category, match.start(), match.end(), classifier._findall_value(match)))
+            position = max(match.end(), match.start() + 1)
+    return matches
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_chunks_normalize_like_the_whole_text(seed):
+    rng = random.Random(seed)
+    text = random_text(rng, 300)
+    normalizer = TextNormalizer(chunk_chars=rng.choice([64, 100, 200]), overlap_chars=8)
+
+    shares = [chunk[start:end] for chunk, start, end in normalizer.chunks(text)]
+
+    assert ''.join(shares) == normalizer.normalize(text)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_chunked_classification_equals_whole_text_scan(seed):
+    rng = random.Random(seed)
+    text = random_text(rng, 400)
+    normalizer = TextNormalizer(chunk_chars=rng.choice([150, 300, 1000]), overlap_chars=120)
+    classifier = NLPThreatClassifier(normalizer, samples_per_category=10_000)
+
+    result = classifier.classify_text(text)
+    expected = whole_text_matches(classifier, normalizer.normalize(text))
+
+    # Matches longer than overlap_chars are out of reach of a chunk
+    assert all(end - start <= normalizer.overlap_chars for _, start, end, _ in expected)
+    counts = {}
+    for category, _, _, _ in expected:
+        counts[category] = counts.get(category, 0) + 1
+    assert result['match_counts'] == counts
+    assert {(sample['category'], sample['offset'], sample['match'])
+            for sample in result['match_samples']} == {(category, start, value) for category, start, _, value in expected}
+
+
+class ChainClassifier(NLPThreatClassifier):
+    # Matches of this pattern overlap their neighbours, so where findall
+    # resumes depends on every earlier match
+    INJECTION_PATTERNS = {'chain': [r'step \d+ step']}
+    EXFILTRATION_PATTERNS = []
+    DECEPTIVE_UI_PATTERNS = []
+
+
+@pytest.mark.parametrize('chunk_chars', range(30, 120))
+def test_chunks_resume_where_the_previous_match_ended(chunk_chars):
+    text = ' '.join(f'step {i}' for i in range(60)) + ' step'
+    normalizer = TextNormalizer(chunk_chars=chunk_chars, overlap_chars=20)
+    classifier = ChainClassifier(normalizer, samples_per_category=100)
+
+    result = classifier.classify_text(text)
+
+    # findall: 'step 0 step', 'step 2 step', ... - every other step
+    assert result['match_counts'] == {'chain': 30}
+    assert [sample['offset'] for sample in result['match_samples']] == \
+        [match.start() for match in re.finditer(r'step \d+ step', text)]
+
+
+def test_text_past_max_chars_is_not_read():
+    normalizer = TextNormalizer(max_chars=40, chunk_chars=16, overlap_chars=4)
+    text = 'word ' * 20
+
+    shares = [chunk[start:end] for chunk, start, end in normalizer.chunks(text)]
+
+    assert ''.join(shares) == normalizer.normalize(text[:40])
+    assert normalizer.is_truncated(text)
+
+
+def test_disguised_keywords_are_folded():
+    normalizer = TextNormalizer()
+
+    assert normalizer.normalize('ｉｇ​nоre  аll') == 'ignore all'